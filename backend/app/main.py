@@ -1,17 +1,26 @@
 # backend/app/main.py
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Form
-from fastapi.responses import JSONResponse
+import time
+from typing import List, Optional
+from fastapi import FastAPI, HTTPException, Body, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.services.document_processor import process_document
-from app.services.summarizer import summarize_document
-from app.services.qa_engine import chat_with_documents
+from app.services.document_processor import save_upload, intake_stage, UploadTooLargeError, MAX_FILE_SIZE
+from app.services.jobs import pipeline, format_sse
+from app.services.pools import run_io, shutdown_pools
+from app.services.admission import AdmissionRejected
+from app.services import admission, metrics, llm_clients
+from app.services.analysis_cache import analysis_cache
+from app.services.vector_stores import store_cache
+from app.services.index_registry import index_registry
+from app.services.summarizer import REPORT_SECTIONS
+from app.services.qa_engine import chat_with_documents, stream_chat_with_documents
 from pydantic import BaseModel, EmailStr
 from app.services.firestore_manager import (
     save_user, 
-    save_document_summary,
     get_documents_by_user_id,
     get_user_by_email
 )
+from app.services.passwords import get_password_hash, verify_password
 
 class RegisterUser(BaseModel):
     name: str
@@ -26,6 +35,21 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Multipart framing overhead allowed on top of MAX_FILE_SIZE before rejecting on Content-Length
+UPLOAD_OVERHEAD_BYTES = 64 * 1024
+
+@app.middleware("http")
+async def reject_oversized_uploads(request: Request, call_next):
+    # Turn away oversized uploads before the multipart body is read
+    if request.url.path == "/documents/upload":
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > MAX_FILE_SIZE + UPLOAD_OVERHEAD_BYTES:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"File exceeds the maximum upload size of {MAX_FILE_SIZE} bytes."},
+            )
+    return await call_next(request)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:3000", "http://127.0.0.1:3000"],
@@ -34,6 +58,32 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    # A saturated stage (or Gemini quota) is a "come back later", not a server error
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc), "stage": exc.stage},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+@app.on_event("startup")
+async def start_job_pipeline():
+    await pipeline.start()
+
+@app.on_event("startup")
+async def create_llm_clients():
+    # Build the shared Gemini clients now instead of on the first request
+    try:
+        await run_io(llm_clients.init_clients)
+    except Exception as e:
+        print(f"Could not initialise LLM clients at startup: {e}")
+
+@app.on_event("shutdown")
+async def stop_job_pipeline():
+    await pipeline.stop()
+    shutdown_pools()
+
 @app.get("/")
 async def root():
     return {"message": "Legal Document Assistant API", "status": "running"}
@@ -42,69 +92,189 @@ async def root():
 async def health_check():
     return {"status": "healthy", "timestamp": "2024-01-01T00:00:00Z"}
 
+@app.get("/metrics")
+async def get_metrics():
+    return {
+        "admission": admission.snapshot(),
+        "job_queues": pipeline.queue_depths(),
+        "vector_store_cache": store_cache.snapshot(),
+        "indexes": index_registry.snapshot(),
+        **metrics.snapshot(),
+    }
+
 @app.get("/documents/user/{user_id}")
 async def get_user_documents(user_id: str):
-    docs = get_documents_by_user_id(user_id)
+    docs = await run_io(get_documents_by_user_id, user_id)
     return {"documents": docs}
 
-@app.post("/documents/upload")
-async def upload_document(
-    file: UploadFile = File(...),
-    user_id: str = Form(...)
-):
-    print("Received user_id:", user_id)
-    print("Received file:", getattr(file, 'filename', None))
+@app.get("/documents/{documentId}/index")
+async def get_document_index(documentId: str):
+    state = index_registry.state(documentId)
+    if state is None:
+        raise HTTPException(status_code=404, detail="Document has no index.")
+    return {"doc_id": documentId, "state": state, "error": index_registry.errors.get(documentId)}
+
+@app.post("/documents/upload", openapi_extra={"requestBody": {"required": True, "content": {"multipart/form-data": {"schema": {
+    "type": "object", "required": ["file", "user_id"],
+    "properties": {"file": {"type": "string", "format": "binary"}, "user_id": {"type": "string"}},
+}}}}})
+async def upload_document(request: Request):
+    # The multipart body is parsed here, straight from the socket into the cache, so the
+    # extraction (or OCR) backlog is checked as soon as the file's name arrives
     try:
-        doc_id, meta = await process_document(file)
-        summary = await summarize_document(doc_id)
-        save_document_summary(user_id, doc_id, meta.get("filename", ""), summary)
-        return {"doc_id": doc_id, "meta": meta, "summary": summary}
+        doc_id, meta, path, form = await save_upload(
+            request, admit=lambda filename: admission.check(intake_stage(filename)))
+        user_id = form.get("user_id")
+        print("Received user_id:", user_id)
+        print("Received file:", meta["filename"])
+        if not user_id:
+            raise HTTPException(status_code=422, detail="user_id is required.")
+        job = pipeline.submit(user_id, doc_id, meta, path)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except (AdmissionRejected, HTTPException):
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    # Extraction, indexing, summarization and persistence continue in the background
+    return JSONResponse(status_code=202, content={"job_id": job.id, "doc_id": doc_id, "meta": meta, "status": job.status})
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = pipeline.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    job = pipeline.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def events():
+        async for entry in job.follow():
+            yield format_sse(entry)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
     
 @app.get("/analysis/{documentId}")
-async def get_analysis(documentId: str):
+async def get_analysis(documentId: str, refresh: bool = False, fields: str = None):
+    if fields:
+        names = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in names if f not in REPORT_SECTIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Valid fields: {', '.join(REPORT_SECTIONS)}.")
     try:
-        summary = await summarize_document(documentId)
-        return JSONResponse(content=summary)
+        if fields:
+            # Only the requested sections, each from its own prompt and cache entry
+            sections, computed = await analysis_cache.get_sections(documentId, names, refresh=refresh)
+            return JSONResponse(content={**sections, "meta": {"fields": names, "computed": computed}})
+        # Served from the analysis cache unless ?refresh=true asks for a new run
+        summary, cached = await analysis_cache.get(documentId, refresh=refresh)
+        return JSONResponse(content=summary, headers={"X-Analysis-Cache": "hit" if cached else "miss"})
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/analysis/{documentId}/stream")
+async def stream_analysis(documentId: str, refresh: bool = False):
+    """Server-sent events: one "section" per report section as it completes, then "done" or "error"."""
+
+    async def events():
+        cached = False
+        try:
+            async for name, value in analysis_cache.stream(documentId, refresh=refresh):
+                if name == "cached":
+                    cached = value
+                elif name == "report":
+                    yield format_sse({"event": "done", "cached": cached, "meta": value.get("meta", {})})
+                else:
+                    yield format_sse({"event": "section", "name": name, "value": value})
+        except AdmissionRejected as e:
+            yield format_sse({"event": "error", "detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            yield format_sse({"event": "error", "detail": str(e)})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @app.post("/chat/user")
-async def chat_user(user_id: str = Body(...), query: str = Body(...)):
-    docs = get_documents_by_user_id(user_id)
+async def chat_user(user_id: str = Body(...), query: str = Body(...), document_ids: Optional[List[str]] = Body(None)):
+    """Answers from the user's documents; document_ids restricts the search to some of them."""
+    docs = await run_io(get_documents_by_user_id, user_id)
     doc_ids = [d["doc_id"] for d in docs if d.get("doc_id")]
     try:
-        response = await chat_with_documents(doc_ids, query)
+        response = await chat_with_documents(doc_ids, query, owner=user_id, selected=document_ids)
         return {"response": response}
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/chat/user/stream")
+async def chat_user_stream(request: Request, user_id: str = Body(...), query: str = Body(...), document_ids: Optional[List[str]] = Body(None)):
+    """Server-sent events: "context" (retrieved sources), then "token"s, then "done" or "error"."""
+    started = time.perf_counter()
+    # Turn away with a plain 429 while we can still set the status code
+    admission.check("llm")
+    docs = await run_io(get_documents_by_user_id, user_id)
+    doc_ids = [d["doc_id"] for d in docs if d.get("doc_id")]
+
+    async def events():
+        stream = stream_chat_with_documents(doc_ids, query, owner=user_id, selected=document_ids)
+        first_token = True
+        try:
+            async for kind, data in stream:
+                if await request.is_disconnected():
+                    metrics.increment("chat_stream.cancelled")
+                    return
+                if kind == "context":
+                    metrics.latency("chat_stream.retrieval").observe(time.perf_counter() - started)
+                    yield format_sse({"event": "context", "sources": data})
+                else:
+                    if first_token:
+                        metrics.latency("chat_stream.ttfb").observe(time.perf_counter() - started)
+                        first_token = False
+                    yield format_sse({"event": "token", "text": data})
+            metrics.latency("chat_stream.total").observe(time.perf_counter() - started)
+            yield format_sse({"event": "done"})
+        except AdmissionRejected as e:
+            yield format_sse({"event": "error", "detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            yield format_sse({"event": "error", "detail": str(e)})
+        finally:
+            # Stops generation when the client goes away mid-answer
+            await stream.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 
     
 @app.post("/auth/register")
 async def register(user: RegisterUser):
     # Check if a user with this email already exists
-    existing_user = get_user_by_email(user.email)
+    existing_user = await run_io(get_user_by_email, user.email)
     if existing_user:
         raise HTTPException(status_code=400, detail="A user with this email already exists.")
     
     try:
-        # The save_user function should handle password hashing internally
-        user_id = save_user(user.name, user.email, user.password)
+        # bcrypt is deliberately slow but releases the GIL; a thread keeps it off the event loop
+        # without queueing behind PDF/OCR work in the process pool
+        hashed_password = await run_io(get_password_hash, user.password)
+        user_id = await run_io(save_user, user.name, user.email, hashed_password)
         return {"message": "User registered successfully", "user": {"id": user_id, "name": user.name, "email": user.email}}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred during registration: {e}")
 
 @app.post("/auth/login")
 async def login(email: str = Body(...), password: str = Body(...)):
-    # Import the new verify_password function
-    from app.services.firestore_manager import verify_password
-
-    user = get_user_by_email(email)
+    user = await run_io(get_user_by_email, email)
     
     # Securely check the password hash instead of plain text
-    if not user or not verify_password(password, user.get("password")):
+    if not user or not await run_io(verify_password, password, user.get("password")):
         raise HTTPException(status_code=401, detail="Invalid credentials")
         
     return {"message": "Login successful", "user": {"id": user.get("id"), "name": user.get("name"), "email": user.get("email")}}
\ No newline at end of file
@@ -13,6 +13,13 @@ class DecisionAssist(BaseModel):
     cons: List[str] = []
     overall_take: str = ""
 
+class ClauseHit(BaseModel):
+    label: str
+    page: Optional[int] = None
+    start: int
+    end: int
+    snippet: str
+
 class AnalysisReport(BaseModel):
     summary: List[str] = []
     key_terms: List[str] = []
@@ -24,4 +31,5 @@ class AnalysisReport(BaseModel):
     negotiation_suggestions: List[str] = []
     decision_assist: DecisionAssist = Field(default_factory=DecisionAssist)
     clause_hits: Dict[str, List[str]] = {}
+    clauses: List[ClauseHit] = []
     meta: Dict[str, Any] = {}
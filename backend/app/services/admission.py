@@ -0,0 +1,141 @@
+# backend/app/services/admission.py
+import os
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from google.api_core.exceptions import ResourceExhausted, TooManyRequests
+from app.services import metrics
+from app.services.pools import JOB_QUEUE_SIZE, JOB_STAGE_WORKERS
+
+# stage -> (concurrency, queue depth); override with ADMISSION_<STAGE>_CONCURRENCY / _QUEUE
+DEFAULT_LIMITS = {
+    # Uploads reach these gates only through the job pipeline's extract workers and its
+    # first queue, so the gates can fill (and uploads get 429) only if sized the same
+    "extraction": (JOB_STAGE_WORKERS, JOB_QUEUE_SIZE),
+    "ocr": (JOB_STAGE_WORKERS, JOB_QUEUE_SIZE),
+    # Query embeddings share one batching worker; waiting callers fill its batches
+    "embedding": (64, 256),
+    "faiss_build": (1, 16),
+    "llm": (8, 64),
+}
+# Upstream errors that mean "slow down" rather than "broken"
+UPSTREAM_RATE_LIMIT_ERRORS = (ResourceExhausted, TooManyRequests)
+MAX_RETRY_AFTER = 60
+
+# Set in background pipeline tasks: they queue for a slot instead of being rejected
+_never_reject = ContextVar("admission_never_reject", default=False)
+
+
+class AdmissionRejected(RuntimeError):
+    """Raised when a stage's queue is full; the API answers 429 with Retry-After."""
+
+    def __init__(self, stage: str, retry_after: int):
+        super().__init__(f"The {stage} stage is at capacity; retry in {retry_after}s.")
+        self.stage = stage
+        self.retry_after = retry_after
+
+
+class StageGate:
+    """Concurrency limit plus a bounded wait queue for one pipeline stage."""
+
+    def __init__(self, name: str, concurrency: int, queue_depth: int):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.queue_depth = queue_depth
+        self.in_flight = 0
+        self.waiting = 0
+        # Work already accepted for this stage but not at the gate yet (uploads in the job queue)
+        self.queued = 0
+        self._sem = asyncio.Semaphore(self.concurrency)
+        self.wait_time = metrics.latency(f"admission.{name}.wait")
+        self.service_time = metrics.latency(f"admission.{name}.service")
+
+    def retry_after(self, backlog: int = None) -> int:
+        # Time for the current queue (or a caller-supplied backlog) to drain at the observed service rate
+        backlog = self.waiting + self.queued if backlog is None else backlog
+        estimate = self.service_time.mean * (backlog + 1) / self.concurrency
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(estimate)))
+
+    def full(self) -> bool:
+        return self.in_flight >= self.concurrency and self.waiting + self.queued >= self.queue_depth
+
+    def check(self):
+        """Rejects now if a new request would not fit in the queue."""
+        if self.full() and not _never_reject.get():
+            metrics.increment(f"admission.{self.name}.rejected")
+            raise AdmissionRejected(self.name, self.retry_after())
+
+    @asynccontextmanager
+    async def slot(self):
+        self.check()
+        self.waiting += 1
+        queued_at = time.perf_counter()
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        started = time.perf_counter()
+        self.wait_time.observe(started - queued_at)
+        self.in_flight += 1
+        try:
+            yield
+        except UPSTREAM_RATE_LIMIT_ERRORS as e:
+            metrics.increment(f"admission.{self.name}.upstream_rate_limited")
+            raise AdmissionRejected(self.name, self.retry_after()) from e
+        finally:
+            self.in_flight -= 1
+            self._sem.release()
+            self.service_time.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            "concurrency": self.concurrency,
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "queued": self.queued,
+            "wait": self.wait_time.snapshot(),
+            "service": self.service_time.snapshot(),
+        }
+
+
+def _limits(stage: str):
+    concurrency, queue_depth = DEFAULT_LIMITS[stage]
+    prefix = f"ADMISSION_{stage.upper()}"
+    return (
+        int(os.getenv(f"{prefix}_CONCURRENCY", concurrency)),
+        int(os.getenv(f"{prefix}_QUEUE", queue_depth)),
+    )
+
+
+gates = {stage: StageGate(stage, *_limits(stage)) for stage in DEFAULT_LIMITS}
+
+
+def slot(stage: str):
+    """async with slot("llm"): ... -- waits for a slot or raises AdmissionRejected."""
+    return gates[stage].slot()
+
+
+def check(stage: str):
+    gates[stage].check()
+
+
+def enqueue(stage: str):
+    """Counts work accepted for stage ahead of time against its queue depth."""
+    gates[stage].queued += 1
+
+
+def dequeue(stage: str):
+    """The enqueued work has reached the stage (or been dropped)."""
+    gates[stage].queued -= 1
+
+
+def run_without_rejection():
+    """Marks the current task as background work that waits rather than being rejected."""
+    _never_reject.set(True)
+
+
+def snapshot() -> dict:
+    return {stage: gate.snapshot() for stage, gate in gates.items()}
@@ -0,0 +1,274 @@
+# backend/app/services/analysis_cache.py
+import os
+import json
+import asyncio
+import tempfile
+from pathlib import Path
+from app.services import metrics
+from app.services.pools import run_io
+from app.services.summarizer import (
+    summarize_section,
+    analyze_sections,
+    PROMPT_VERSION,
+    SECTION_PROMPT_VERSION,
+    SUMMARY_MODEL,
+    REPORT_SECTIONS,
+)
+from app.services.firestore_manager import get_cached_analysis, save_cached_analysis
+
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "../cache"))
+ANALYSIS_CACHE_DIR = CACHE_DIR / "analysis"
+# Reports kept on local disk; the least recently read are evicted first
+ANALYSIS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", 512))
+
+
+def cache_key(doc_id: str) -> str:
+    """doc_id is the content hash, so equal bytes share a report until the prompt or model changes."""
+    return f"{doc_id}_{PROMPT_VERSION}_{SUMMARY_MODEL}"
+
+
+def section_key(doc_id: str, name: str) -> str:
+    """Sections computed on their own (?fields=) are cached one entry per section."""
+    return f"{doc_id}_{name}_{SECTION_PROMPT_VERSION}_{SUMMARY_MODEL}"
+
+
+class AnalysisCache:
+    """Read-through cache of analysis reports: local disk (LRU) in front of Firestore."""
+
+    def __init__(self, directory: Path = ANALYSIS_CACHE_DIR, max_entries: int = ANALYSIS_CACHE_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._inflight = {}
+        self._feeds = {}
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _read_disk(self, key: str):
+        path = self._path(key)
+        try:
+            report = json.loads(path.read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+        # mtime doubles as the LRU clock
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another thread since the read: a miss, like any evicted entry
+            return None
+        return report
+
+    def _write_disk(self, key: str, report: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, prefix=".analysis_", suffix=".part")
+        with os.fdopen(fd, "w", encoding="utf-8") as out:
+            json.dump(report, out)
+        os.replace(tmp_name, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        # Other threads evict too: files may vanish between the listing and the stat
+        for path in self.directory.glob("*.json"):
+            try:
+                entries.append((path.stat().st_mtime, path))
+            except FileNotFoundError:
+                continue
+        excess = len(entries) - self.max_entries
+        if excess > 0:
+            entries.sort(key=lambda entry: entry[0])
+            for _, path in entries[:excess]:
+                path.unlink(missing_ok=True)
+
+    def _read_firestore(self, key: str):
+        try:
+            return get_cached_analysis(key)
+        except Exception as e:
+            print(f"Analysis cache: Firestore read failed for {key}: {e}")
+            return None
+
+    def _write_firestore(self, key: str, doc_id: str, report: dict):
+        try:
+            save_cached_analysis(key, doc_id, report)
+        except Exception as e:
+            print(f"Analysis cache: Firestore write failed for {key}: {e}")
+
+    async def lookup(self, doc_id: str):
+        """Returns (report, tier) where tier is "disk" or "firestore", or (None, None)."""
+        return await self._lookup_key(cache_key(doc_id))
+
+    async def _lookup_key(self, key: str):
+        report = await run_io(self._read_disk, key)
+        if report is not None:
+            return report, "disk"
+        report = await run_io(self._read_firestore, key)
+        if report is not None:
+            await run_io(self._write_disk, key, report)
+            return report, "firestore"
+        return None, None
+
+    async def store(self, doc_id: str, report: dict, key: str = None):
+        key = key or cache_key(doc_id)
+        await run_io(self._write_disk, key, report)
+        await run_io(self._write_firestore, key, doc_id, report)
+
+    async def get(self, doc_id: str, refresh: bool = False):
+        """Returns (report, cached). Runs the summarizer on a miss or when refresh is set.
+
+        Concurrent requests for the same document share one summarizer run.
+        """
+        if not refresh:
+            report, tier = await self.lookup(doc_id)
+            if report is not None:
+                metrics.increment(f"analysis_cache.hit.{tier}")
+                return report, True
+        metrics.increment("analysis_cache.refresh" if refresh else "analysis_cache.miss")
+        task, _ = self._analysis(doc_id)
+        return await asyncio.shield(task), False
+
+    async def get_sections(self, doc_id: str, names, refresh: bool = False):
+        """Returns ({name: value}, names computed now) for just the requested sections.
+
+        A cached full report answers first, then per-section entries; whatever
+        is still missing is computed with one small prompt per section, all
+        concurrently, and cached on its own.
+        """
+        found = {}
+        if not refresh:
+            report, _ = await self.lookup(doc_id)
+            if report is not None:
+                found = {name: report[name] for name in names if name in report}
+            missing = [name for name in names if name not in found]
+            entries = await asyncio.gather(*[self._lookup_key(section_key(doc_id, name)) for name in missing])
+            for name, (entry, _) in zip(missing, entries):
+                if entry is not None:
+                    found[name] = entry[name]
+        missing = [name for name in names if name not in found]
+        metrics.increment("analysis_cache.section_hit", len(names) - len(missing))
+        metrics.increment("analysis_cache.section_miss", len(missing))
+        values = await asyncio.gather(*[
+            self._shared(section_key(doc_id, name), lambda name=name: self._generate_section(doc_id, name))
+            for name in missing
+        ])
+        found.update(zip(missing, values))
+        return found, missing
+
+    async def _shared(self, key: str, generate):
+        # Concurrent requests for the same entry share one generation
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.ensure_future(generate())
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    def _analysis(self, doc_id: str):
+        """(task, feed) of the document's full analysis, joining the one in flight if there is one.
+
+        The task returns the stored report; the feed replays the sections
+        written so far to each stream that attaches, then follows live.
+        """
+        key = cache_key(doc_id)
+        task = self._inflight.get(key)
+        if task is None:
+            feed = self._feeds[key] = _Feed()
+            task = self._inflight[key] = asyncio.ensure_future(self._generate(doc_id, feed))
+
+            def forget(done):
+                self._inflight.pop(key, None)
+                self._feeds.pop(key, None)
+                # Streams learn of a failure through the feed; nobody may await the task itself
+                if not done.cancelled():
+                    done.exception()
+
+            task.add_done_callback(forget)
+        return task, self._feeds[key]
+
+    async def stream(self, doc_id: str, refresh: bool = False):
+        """Async generator: ("cached", bool), then (section, value) pairs, then ("report", full report).
+
+        Cached reports are replayed at once. Otherwise the sections come
+        from the one generation per document, started here or by an earlier
+        caller (a stream, GET /analysis or the upload pipeline), as the model
+        writes them; the finished report is stored by that generation.
+        """
+        if not refresh:
+            report, tier = await self.lookup(doc_id)
+            if report is not None:
+                metrics.increment(f"analysis_cache.hit.{tier}")
+                yield "cached", True
+                for item in _replay(report):
+                    yield item
+                return
+        if cache_key(doc_id) not in self._inflight:
+            metrics.increment("analysis_cache.refresh" if refresh else "analysis_cache.miss")
+        yield "cached", False
+        _, feed = self._analysis(doc_id)
+        async for item in feed.follow():
+            yield item
+
+    async def _generate(self, doc_id: str, feed: "_Feed"):
+        try:
+            async for name, value in analyze_sections(doc_id):
+                if name == "report":
+                    await self.store(doc_id, value)
+                feed.publish((name, value))
+        except BaseException as e:
+            feed.close(e if isinstance(e, Exception) else RuntimeError("Analysis was cancelled."))
+            raise
+        feed.close()
+        return value
+
+    async def _generate_section(self, doc_id: str, name: str):
+        value = await summarize_section(doc_id, name)
+        await self.store(doc_id, {name: value}, key=section_key(doc_id, name))
+        return value
+
+
+class _Feed:
+    """The (section, value) items of one in-flight analysis, for every stream following it."""
+
+    def __init__(self):
+        self.items = []
+        self.error = None
+        self.closed = False
+        self._listeners = set()
+
+    def publish(self, item):
+        self.items.append(item)
+        for queue in self._listeners:
+            queue.put_nowait(item)
+
+    def close(self, error: Exception = None):
+        self.error = error
+        self.closed = True
+        for queue in self._listeners:
+            queue.put_nowait(None)
+
+    async def follow(self):
+        """Yields every item, past ones first, until the analysis ends; re-raises its error."""
+        queue = asyncio.Queue()
+        for item in self.items:
+            queue.put_nowait(item)
+        if self.closed:
+            queue.put_nowait(None)
+        self._listeners.add(queue)
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                yield item
+        finally:
+            self._listeners.discard(queue)
+
+
+def _replay(report: dict):
+    for name in REPORT_SECTIONS:
+        if name in report:
+            yield name, report[name]
+    yield "report", report
+
+
+analysis_cache = AnalysisCache()
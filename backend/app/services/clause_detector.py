@@ -0,0 +1,175 @@
+# backend/app/services/clause_detector.py
+import os
+import re
+import json
+import bisect
+import hashlib
+from pathlib import Path
+
+CACHE_DIR = Path(os.getenv("CACHE_DIR", "../cache"))
+# Characters of context kept on each side of a hit
+CLAUSE_SNIPPET_CHARS = 120
+# Hits kept per clause type when stored with the document (counts stay exact)
+CLAUSE_MAX_HITS_PER_LABEL = int(os.getenv("CLAUSE_MAX_HITS_PER_LABEL", 50))
+
+CLAUSE_PATTERNS = {
+    "Arbitration / Class Action Waiver": r"(arbitration|class\s+action\s+waiver|binding\s+arbitration)",
+    "Jury Trial Waiver": r"(waiver\s+of\s+jury\s+trial|jury\s+trial\s+waived)",
+    "Confession of Judgment": r"(confession\s+of\s+judgment|cognovit)",
+    "Prepayment Penalty": r"(prepayment\s+penalt(y|ies)|early\s+termination\s+fee)",
+    "Balloon Payment": r"(balloon\s+payment)",
+    "Variable / Adjustable Rate": r"(variable\s+rate|adjustable\s+rate|apr\s+may\s+change|index\s+rate)",
+    "Cross-Default / Cross-Collateralization": r"(cross-?default|cross-?collateral)",
+    "Late Fees / Default Interest": r"(late\s+fee|default\s+interest)",
+    "Auto-Renewal / Evergreen": r"(auto-?renew|evergreen\s+term)",
+    "Liquidated Damages": r"(liquidated\s+damages)",
+    "Personal Guarantee": r"(personal\s+guarant(ee|y))",
+    "Governing Law / Venue": r"(governing\s+law|venue|jurisdiction)",
+}
+
+RISK_WEIGHTS = {
+    "Arbitration / Class Action Waiver": 12,
+    "Jury Trial Waiver": 8,
+    "Confession of Judgment": 15,
+    "Prepayment Penalty": 8,
+    "Balloon Payment": 10,
+    "Variable / Adjustable Rate": 10,
+    "Cross-Default / Cross-Collateralization": 10,
+    "Late Fees / Default Interest": 6,
+    "Auto-Renewal / Evergreen": 6,
+    "Liquidated Damages": 6,
+    "Personal Guarantee": 12,
+    "Governing Law / Venue": 5,
+}
+
+PAGE_MARKER = re.compile(r"^--- Page (\d+) ---$", re.MULTILINE)
+
+# Changes when a pattern or weight changes; part of the cached result's file name
+PATTERNS_VERSION = hashlib.sha256(
+    json.dumps([CLAUSE_PATTERNS, RISK_WEIGHTS], sort_keys=True).encode()
+).hexdigest()[:12]
+
+
+def _top_level_alternatives(pattern: str):
+    """Splits "(a|b(c|d))" into ["a", "b(c|d)"]."""
+    if pattern.startswith("(") and pattern.endswith(")"):
+        pattern = pattern[1:-1]
+    parts, depth, current = [], 0, ""
+    for i, ch in enumerate(pattern):
+        escaped = i > 0 and pattern[i - 1] == "\\"
+        if ch == "(" and not escaped:
+            depth += 1
+        elif ch == ")" and not escaped:
+            depth -= 1
+        if ch == "|" and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += ch
+    return parts + [current]
+
+
+def _compile(patterns: dict):
+    """Compiles every clause pattern into one matcher that scans the text once.
+
+    All alternatives of all patterns are flattened into a single top-level
+    alternation, in CLAUSE_PATTERNS order, with inner groups made
+    non-capturing. Because every alternative starts with a literal, the
+    regex engine can skip straight to positions whose character could start
+    a clause; with one named group per clause type it cannot, and ends up
+    slower than twelve separate scans. Matching is case-sensitive on text
+    lowered beforehand (patterns are written in lower case), which keeps that
+    skip working too. The clause type of a hit is the first pattern that
+    fully matches the hit's text.
+    """
+    capturing = re.compile(r"(?<!\\)\((?!\?)")
+    flat = "|".join(alt for pattern in patterns.values() for alt in _top_level_alternatives(pattern))
+    matcher = re.compile(capturing.sub("(?:", flat))
+    labellers = [(label, re.compile(pattern)) for label, pattern in patterns.items()]
+    return matcher, labellers
+
+
+CLAUSE_MATCHER, _LABELLERS = _compile(CLAUSE_PATTERNS)
+# ASCII-only lowering keeps every offset valid in the original text
+_ASCII_LOWER = str.maketrans("ABCDEFGHIJKLMNOPQRSTUVWXYZ", "abcdefghijklmnopqrstuvwxyz")
+
+
+def _label_of(matched: str) -> str:
+    for label, pattern in _LABELLERS:
+        if pattern.fullmatch(matched):
+            return label
+    return "Other"
+
+
+def _page_index(text: str):
+    """(offsets, page numbers) of the '--- Page N ---' markers, for bisecting a hit's page."""
+    offsets, pages = [], []
+    for m in PAGE_MARKER.finditer(text):
+        offsets.append(m.start())
+        pages.append(int(m.group(1)))
+    return offsets, pages
+
+
+def detect_clauses(text: str):
+    """Finds every clause pattern in one pass over text.
+
+    Returns a list of {"label", "page", "start", "end", "snippet"} in
+    document order; page is None for text without page markers. Unlike
+    separate scans per pattern, hits never overlap: where two patterns
+    match at the same place, the one listed first wins.
+    """
+    offsets, pages = _page_index(text)
+    hits = []
+    for m in CLAUSE_MATCHER.finditer(text.translate(_ASCII_LOWER)):
+        start, end = m.span()
+        i = bisect.bisect_right(offsets, start) - 1
+        snippet = text[max(0, start - CLAUSE_SNIPPET_CHARS):end + CLAUSE_SNIPPET_CHARS]
+        hits.append({
+            "label": _label_of(m.group()),
+            "page": pages[i] if i >= 0 else None,
+            "start": start,
+            "end": end,
+            "snippet": snippet.strip().replace("\n", " "),
+        })
+    return hits
+
+
+def score_risk(counts: dict) -> int:
+    """Naive 0-100 score: the weight of every clause type found at least once."""
+    score = sum(RISK_WEIGHTS.get(label, 3) for label, n in counts.items() if n)
+    return max(0, min(100, score))
+
+
+def summarize_hits(hits):
+    """Hits grouped for storage: capped hit list, snippets per type, exact counts and the risk score."""
+    counts = {label: 0 for label in CLAUSE_PATTERNS}
+    kept = []
+    by_label = {label: [] for label in CLAUSE_PATTERNS}
+    for hit in hits:
+        label = hit["label"]
+        counts[label] += 1
+        if counts[label] <= CLAUSE_MAX_HITS_PER_LABEL:
+            kept.append(hit)
+            by_label[label].append(hit["snippet"])
+    return {
+        "hits": kept,
+        "clause_hits": by_label,
+        "counts": counts,
+        "risk_score": score_risk(counts),
+        "version": PATTERNS_VERSION,
+    }
+
+
+def _clauses_path(fid: str) -> Path:
+    return CACHE_DIR / f"clauses_{fid}_{PATTERNS_VERSION}.json"
+
+
+def document_clauses(fid: str) -> dict:
+    """Clause hits and risk score for an extracted document, computed once and cached next to its text."""
+    path = _clauses_path(fid)
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    text = (CACHE_DIR / f"extract_{fid}.txt").read_text(encoding="utf-8")
+    result = summarize_hits(detect_clauses(text))
+    path.write_text(json.dumps(result), encoding="utf-8")
+    return result
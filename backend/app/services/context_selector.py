@@ -0,0 +1,162 @@
+# backend/app/services/context_selector.py
+import os
+import re
+import bisect
+import threading
+import numpy as np
+from app.services.clause_detector import detect_clauses, RISK_WEIGHTS
+from app.services.vector_stores import embed_query
+
+# Tokens of document text sent to the model in "select" summary mode
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", 6000))
+# Target size of the chunks that are ranked and packed
+SELECT_CHUNK_CHARS = int(os.getenv("SELECT_CHUNK_CHARS", 1500))
+# Relative weight of clause hits vs embedding salience in a chunk's score
+SELECT_CLAUSE_WEIGHT = float(os.getenv("SELECT_CLAUSE_WEIGHT", 0.6))
+SELECT_SALIENCE_WEIGHT = float(os.getenv("SELECT_SALIENCE_WEIGHT", 0.4))
+# The opening chunk (parties, document type) gets this bonus so it is usually kept
+SELECT_INTRO_BONUS = float(os.getenv("SELECT_INTRO_BONUS", 0.5))
+# What a chunk worth summarizing is about; compared against the stored chunk vectors
+SALIENCE_QUERY = (
+    "obligations, payments, fees, penalties, interest, termination, renewal, "
+    "liability, guarantees, deadlines and rights of each party"
+)
+GAP_MARKER = "\n\n[...]\n\n"
+
+_SENTENCE_END = re.compile(r"(?<=[\.!?])\s+")
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+def _load_token_counter(model: str):
+    """Best available tokenizer: Gemini's local tokenizer, then tiktoken, then ~4 chars per token."""
+    try:
+        from vertexai.preview import tokenization
+        tokenizer = tokenization.get_tokenizer_for_model(model)
+        return "vertex", lambda text: tokenizer.count_tokens(text).total_tokens
+    except Exception:
+        pass
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return "tiktoken", lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        pass
+    return "chars/4", lambda text: max(1, len(text) // 4)
+
+
+def token_counter(model: str):
+    """Returns (tokenizer name, count function), loaded once."""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                _counter = _load_token_counter(model)
+    return _counter
+
+
+def chunk_spans(text: str, max_chars: int = SELECT_CHUNK_CHARS):
+    """Splits text on sentence ends into (start, end) spans of up to max_chars, covering all of it."""
+    spans = []
+    start = 0
+    last_break = 0
+    for m in _SENTENCE_END.finditer(text):
+        if m.start() - start > max_chars and last_break > start:
+            spans.append((start, last_break))
+            start = last_break
+        last_break = m.end()
+    while len(text) - start > max_chars and last_break > start:
+        spans.append((start, last_break))
+        start = last_break
+    if start < len(text):
+        spans.append((start, len(text)))
+    return spans
+
+
+def _clause_scores(text: str, spans):
+    """Sum of risk weights of the clause hits starting in each span."""
+    scores = [0.0] * len(spans)
+    starts = [s for s, _ in spans]
+    i = 0
+    for hit in detect_clauses(text):
+        while i + 1 < len(spans) and starts[i + 1] <= hit["start"]:
+            i += 1
+        scores[i] += RISK_WEIGHTS.get(hit["label"], 3)
+    return scores
+
+
+def _salience_scores(text: str, spans, store):
+    """Relevance of each span to SALIENCE_QUERY, from the document's existing FAISS vectors.
+
+    Only the query is embedded: it is searched against every stored chunk and
+    each chunk's similarity goes to the span the chunk starts in (best wins).
+    """
+    scores = [0.0] * len(spans)
+    if store is None or not store.index.ntotal:
+        return scores
+    starts = [s for s, _ in spans]
+    # Stored chunks are verbatim slices of text, in document order
+    offsets, pos = {}, 0
+    for i in range(store.index.ntotal):
+        head = store.docstore.search(store.index_to_docstore_id[i]).page_content[:200]
+        found = text.find(head, pos)
+        if found >= 0:
+            offsets[i] = pos = found
+    query = np.array([embed_query(SALIENCE_QUERY)], dtype="float32")
+    distances, positions = store.index.search(query, store.index.ntotal)
+    for distance, i in zip(distances[0], positions[0]):
+        if i in offsets:
+            span = bisect.bisect_right(starts, offsets[i]) - 1
+            # Squared L2 between unit vectors is 2 - 2 * cosine
+            scores[span] = max(scores[span], max(0.0, 1.0 - float(distance) / 2))
+    return scores
+
+
+def select_context(text: str, model: str, budget: int = SUMMARY_TOKEN_BUDGET, store=None):
+    """Picks the most valuable chunks of text that fit in budget tokens.
+
+    Chunks are scored by the risk weight of the clauses they contain and by
+    embedding salience, packed greedily by score, then put back in document
+    order with a gap marker where text was left out.
+    Returns (selected text, info dict).
+    """
+    tokenizer, count = token_counter(model)
+    spans = chunk_spans(text)
+    clause = _clause_scores(text, spans)
+    salience = _salience_scores(text, spans, store)
+    top_clause = max(clause) or 1.0
+    scores = [
+        SELECT_CLAUSE_WEIGHT * c / top_clause + SELECT_SALIENCE_WEIGHT * s
+        for c, s in zip(clause, salience)
+    ]
+    if scores:
+        scores[0] += SELECT_INTRO_BONUS
+
+    chosen, used = [], 0
+    for i in sorted(range(len(spans)), key=lambda i: -scores[i]):
+        start, end = spans[i]
+        tokens = count(text[start:end])
+        if used + tokens <= budget:
+            chosen.append(i)
+            used += tokens
+
+    chosen.sort()
+    parts = []
+    for n, i in enumerate(chosen):
+        start, end = spans[i]
+        if n and chosen[n - 1] != i - 1:
+            parts.append(GAP_MARKER)
+        elif n:
+            parts.append(" ")
+        parts.append(text[start:end].strip())
+    info = {
+        "tokenizer": tokenizer,
+        "budget": budget,
+        "tokens": used,
+        "chunks": len(spans),
+        "selected_chunks": len(chosen),
+        "clause_chunks_kept": sum(1 for i in chosen if clause[i]),
+        "clause_chunks": sum(1 for c in clause if c),
+    }
+    return "".join(parts), info
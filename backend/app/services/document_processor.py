@@ -1,27 +1,202 @@
 # backend/app/services/document_processor.py
 import os
 import hashlib
+import tempfile
 from pathlib import Path
-from fastapi import UploadFile
-from app.utils import file_fingerprint
 from app.services.extractor import Extractor
+from app.services.pools import run_io
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13 ships the module as "multipart"
+    from multipart.multipart import MultipartParser, parse_options_header
 
 CACHE_DIR = Path(os.getenv("CACHE_DIR", "../cache"))
+# Uploads are copied to disk in blocks of this many bytes
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+# Uploads larger than this are rejected as soon as the limit is crossed
+MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", 10 * 1024 * 1024))
+# Plain form fields (user_id) are kept in memory; anything longer is refused
+MAX_FIELD_SIZE = 64 * 1024
+
+SUPPORTED_EXTENSIONS = ["pdf", "png", "jpg", "jpeg", "bmp", "tiff", "gif"]
 
 extractor = Extractor(CACHE_DIR)
 
-async def process_document(file: UploadFile):
-    ext = file.filename.lower().split('.')[-1]
-    contents = await file.read()
-    temp_path = CACHE_DIR / file.filename
-    temp_path.write_bytes(contents)
-    if ext == "pdf":
-        text = extractor.from_pdf(str(temp_path))
-    elif ext in ["png", "jpg", "jpeg", "bmp", "tiff", "gif"]:
-        text = extractor.from_image(str(temp_path))
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds MAX_FILE_SIZE."""
+
+    def __init__(self, limit: int = MAX_FILE_SIZE):
+        super().__init__(f"File exceeds the maximum upload size of {limit} bytes.")
+        self.limit = limit
+
+
+def upload_path(fid: str, ext: str) -> Path:
+    """Where the raw bytes of a content-addressed upload live."""
+    return CACHE_DIR / f"upload_{fid}.{ext}"
+
+
+class _MultipartUpload:
+    """Parser callbacks for one multipart/form-data upload: a single file part plus small fields.
+
+    File bytes are hashed as they are parsed and collected in pending until
+    the caller writes them out; fields are kept in memory.
+    """
+
+    def __init__(self, admit=None):
+        self.fields = {}
+        self.filename = None
+        self.ext = None
+        self.size = 0
+        self.digest = hashlib.sha256()
+        self.pending = []
+        self.pending_size = 0
+        self.out = None
+        self.tmp_name = None
+        self._admit = admit
+        self._in_file = False
+        self._name = None
+        self._value = b""
+        self._headers = {}
+        self._header_name = b""
+        self._header_value = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self.on_part_begin,
+            "on_part_data": self.on_part_data,
+            "on_part_end": self.on_part_end,
+            "on_header_field": self.on_header_field,
+            "on_header_value": self.on_header_value,
+            "on_header_end": self.on_header_end,
+            "on_headers_finished": self.on_headers_finished,
+        }
+
+    def on_part_begin(self):
+        self._headers = {}
+        self._value = b""
+
+    def on_header_field(self, data, start, end):
+        self._header_name += data[start:end]
+
+    def on_header_value(self, data, start, end):
+        self._header_value += data[start:end]
+
+    def on_header_end(self):
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = self._header_value = b""
+
+    def on_headers_finished(self):
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        self._name = options.get(b"name", b"").decode("utf-8", "replace")
+        self._in_file = b"filename" in options
+        if not self._in_file:
+            return
+        if self.filename is not None:
+            raise ValueError("Only one file can be uploaded at a time")
+        self.filename = options[b"filename"].decode("utf-8", "replace")
+        self.ext = self.filename.lower().split('.')[-1]
+        if self.ext not in SUPPORTED_EXTENSIONS:
+            raise ValueError("Unsupported file type")
+        # Known before any file bytes are read, so a backed-up stage can turn the upload away here
+        if self._admit:
+            self._admit(self.filename)
+        fd, self.tmp_name = tempfile.mkstemp(dir=CACHE_DIR, prefix=".upload_", suffix=".part")
+        self.out = os.fdopen(fd, "wb")
+
+    def on_part_data(self, data, start, end):
+        if not self._in_file:
+            self._value += data[start:end]
+            if len(self._value) > MAX_FIELD_SIZE:
+                raise ValueError(f"Form field {self._name!r} is too large")
+            return
+        block = data[start:end]
+        self.size += len(block)
+        if self.size > MAX_FILE_SIZE:
+            raise UploadTooLargeError()
+        self.digest.update(block)
+        self.pending.append(block)
+        self.pending_size += len(block)
+
+    def on_part_end(self):
+        if not self._in_file:
+            self.fields[self._name] = self._value.decode("utf-8", "replace")
+
+    def take_pending(self) -> bytes:
+        block = b"".join(self.pending)
+        self.pending, self.pending_size = [], 0
+        return block
+
+
+async def spool_upload(request, admit=None):
+    """Streams a multipart upload from the request body straight to disk, hashing it on the way.
+
+    The file part is written in UPLOAD_CHUNK_SIZE blocks to a temp file in
+    CACHE_DIR, which is the only copy made: it is renamed to its
+    content-addressed path once the digest is known, so a partially written
+    upload never shows up there. If the same bytes were uploaded before, the
+    temp file is dropped and the existing copy is kept. admit(filename) is
+    called before the first file byte is read and may raise to reject it.
+    Returns (sha256 hex digest, size in bytes, path, filename, form fields).
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or b"boundary" not in params:
+        raise ValueError("Expected a multipart/form-data upload")
+    CACHE_DIR.mkdir(exist_ok=True, parents=True)
+    upload = _MultipartUpload(admit)
+    parser = MultipartParser(params[b"boundary"], upload.callbacks())
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if upload.pending_size >= UPLOAD_CHUNK_SIZE:
+                await run_io(upload.out.write, upload.take_pending())
+        parser.finalize()
+        if upload.out is None:
+            raise ValueError("No file in upload")
+        await run_io(upload.out.write, upload.take_pending())
+        upload.out.close()
+        fid = upload.digest.hexdigest()
+        dest = upload_path(fid, upload.ext)
+        if dest.exists():
+            Path(upload.tmp_name).unlink()
+        else:
+            os.replace(upload.tmp_name, dest)
+    except BaseException:
+        if upload.out is not None:
+            upload.out.close()
+            Path(upload.tmp_name).unlink(missing_ok=True)
+        raise
+    return fid, upload.size, dest, upload.filename, upload.fields
+
+
+async def save_upload(request, admit=None):
+    """Validates and stores the upload in a request. Returns (fid, meta, path, form fields); no extraction yet."""
+    fid, size, path, filename, fields = await spool_upload(request, admit)
+    # Same bytes seen before (by anyone): the cached extraction will be reused
+    meta = {"filename": filename, "fid": fid, "size": size, "deduplicated": extractor.is_cached(fid)}
+    return fid, meta, path, fields
+
+
+def intake_stage(filename: str) -> str:
+    """Admission stage an upload is charged to: PDFs go to extraction, images to OCR."""
+    return "extraction" if filename.lower().endswith(".pdf") else "ocr"
+
+
+def extract_document(fid: str, path: Path) -> dict:
+    """Extracts the text of a stored upload into the cache. Returns extra meta."""
+    if path.suffix == ".pdf":
+        extractor.from_pdf(str(path), fid=fid)
     else:
-        raise ValueError("Unsupported file type")
+        extractor.from_image(str(path), fid=fid)
     print("file saved in cache successfully")
-    fid = file_fingerprint(str(temp_path))
-    meta = {"filename": file.filename, "fid": fid}
-    return fid, meta
+    ocr = extractor.ocr_stats(fid)
+    return {"ocr": ocr} if ocr else {}
+
+
+def read_extracted_text(fid: str) -> str:
+    """The cached extraction of a document; FileNotFoundError if it was never extracted."""
+    if not extractor.is_cached(fid):
+        raise FileNotFoundError("Document not found in cache.")
+    return (CACHE_DIR / f"extract_{fid}.txt").read_text(encoding="utf-8")
+
@@ -0,0 +1,144 @@
+# backend/app/services/embedding_service.py
+import os
+import time
+import queue
+import asyncio
+import itertools
+import threading
+from concurrent.futures import Future, InvalidStateError
+from app.services import metrics
+
+# How long the worker waits for more requests before running a batch
+EMBED_BATCH_WINDOW_MS = float(os.getenv("EMBED_BATCH_WINDOW_MS", 5))
+# Texts per forward pass; larger requests (whole documents) are split into slices this size
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", 64))
+# Threads torch uses inside one forward pass; 0 leaves torch's default
+EMBED_INTRA_OP_THREADS = int(os.getenv("EMBED_INTRA_OP_THREADS", 0))
+
+# Queries jump ahead of document chunks waiting for the encoder
+QUERY = 0
+DOCUMENT = 1
+
+
+class EmbeddingService:
+    """Runs every embedding request of the process through one batching worker thread.
+
+    Callers from any thread or event loop submit texts and get a future. The
+    worker takes the most urgent waiting request, keeps collecting others for
+    up to EMBED_BATCH_WINDOW_MS or until EMBED_MAX_BATCH texts, and encodes
+    them in one forward pass. One pass at a time with all intra-op threads
+    replaces many one-text passes competing for the same cores.
+    """
+
+    def __init__(self, model, window_ms: float = EMBED_BATCH_WINDOW_MS, max_batch: int = EMBED_MAX_BATCH,
+                 intra_op_threads: int = EMBED_INTRA_OP_THREADS):
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch = max(1, max_batch)
+        self.intra_op_threads = intra_op_threads
+        self._queue = queue.PriorityQueue()
+        self._order = itertools.count()
+        self._worker = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._start_lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+                    self._worker.start()
+
+    def submit(self, texts, priority: int = QUERY):
+        """Queues texts for embedding; returns one future per slice of at most max_batch texts."""
+        self._ensure_worker()
+        futures = []
+        for i in range(0, len(texts), self.max_batch):
+            future = Future()
+            self._queue.put((priority, next(self._order), list(texts[i:i + self.max_batch]), future, time.perf_counter()))
+            futures.append(future)
+        return futures
+
+    def embed(self, texts, priority: int = DOCUMENT):
+        """Blocking: the vectors of texts, in order."""
+        return [vector for future in self.submit(texts, priority) for vector in future.result()]
+
+    async def aembed(self, texts, priority: int = QUERY):
+        futures = [asyncio.wrap_future(future) for future in self.submit(texts, priority)]
+        return [vector for vectors in await asyncio.gather(*futures) for vector in vectors]
+
+    def _set_threads(self):
+        if self.intra_op_threads <= 0:
+            return
+        try:
+            import torch
+            torch.set_num_threads(self.intra_op_threads)
+        except ImportError:
+            pass
+
+    def _next_batch(self):
+        batch, size = [], 0
+        while not batch:
+            item = self._queue.get()
+            # Callers that gave up (a cancelled await cancels the future) are dropped here
+            if item[3].set_running_or_notify_cancel():
+                batch.append(item)
+                size = len(item[2])
+        deadline = time.perf_counter() + self.window
+        while size < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if size + len(item[2]) > self.max_batch:
+                # Does not fit; it leads the next batch
+                self._queue.put(item)
+                break
+            if item[3].set_running_or_notify_cancel():
+                batch.append(item)
+                size += len(item[2])
+        return batch
+
+    def _run(self):
+        self._set_threads()
+        # The only embedding thread: nothing may end this loop
+        while True:
+            batch = []
+            try:
+                batch = self._next_batch()
+                self._run_batch(batch)
+            except Exception as e:
+                print(f"Embedding service: batch failed: {e}")
+                for item in batch:
+                    _settle(item[3], error=e)
+
+    def _run_batch(self, batch):
+        texts = [text for item in batch for text in item[2]]
+        started = time.perf_counter()
+        try:
+            vectors = self.model.embed_documents(texts)
+        except Exception as e:
+            for item in batch:
+                _settle(item[3], error=e)
+            return
+        metrics.latency("embedding.forward_pass").observe(time.perf_counter() - started)
+        metrics.increment("embedding.batches")
+        metrics.increment("embedding.texts", len(texts))
+        offset = 0
+        for _, _, item_texts, future, queued_at in batch:
+            metrics.latency("embedding.queue_wait").observe(started - queued_at)
+            _settle(future, result=vectors[offset:offset + len(item_texts)])
+            offset += len(item_texts)
+
+
+def _settle(future: Future, result=None, error: Exception = None):
+    # The caller may have been cancelled while its batch was running
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
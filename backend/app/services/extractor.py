@@ -1,9 +1,141 @@
 # backend/app/services/extractor.py
+import os
+import json
+import math
+from collections import deque
 from pathlib import Path
-from PIL import Image, ImageEnhance
-import pytesseract
+from PIL import Image
 from PyPDF2 import PdfReader
 from app.utils import file_fingerprint
+from app.services import ocr_engine
+from app.services.preprocess import preprocess, normalize_resolution
+from app.services.pools import get_process_pool, CPU_WORKERS
+
+try:
+    from pdf2image import convert_from_path
+except ImportError:  # poppler bindings are optional; scanned pages are then skipped
+    convert_from_path = None
+
+# Pool workers one document keeps busy at once (PDF text ranges and OCR pages, frames of a
+# multi-frame image), leaving the rest of the CPU_WORKERS processes to other uploads; also
+# sets how many ranges a PDF is split into
+PDF_WORKERS = max(1, min(int(os.getenv("PDF_WORKERS", CPU_WORKERS)), CPU_WORKERS))
+# PDFs with fewer pages than this are read serially, skipping the pool overhead
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", 32))
+# Ranges handed out per worker, so one slow range does not hold up the rest
+PDF_RANGES_PER_WORKER = 4
+# OCR pages whose text layer is missing or shorter than PDF_OCR_MIN_CHARS
+PDF_OCR_FALLBACK = os.getenv("PDF_OCR_FALLBACK", "1") == "1"
+PDF_OCR_MIN_CHARS = int(os.getenv("PDF_OCR_MIN_CHARS", 16))
+PDF_OCR_DPI = int(os.getenv("PDF_OCR_DPI", 300))
+# "tiered": fast pass with layout analysis, heavy re-OCR of low-confidence blocks only;
+# "single": one full --psm 6 pass over the preprocessed image
+OCR_MODE = os.getenv("OCR_MODE", "tiered")
+# Blocks whose mean word confidence is below this get the second pass
+OCR_CONFIDENCE_THRESHOLD = float(os.getenv("OCR_CONFIDENCE_THRESHOLD", 70))
+# Margin added around a weak block before it is cropped for re-OCR
+OCR_REGION_PADDING = 8
+
+
+def _ocr_stats(regions=0, second_pass=0, conf_sum=0.0, words=0):
+    return {"regions": regions, "second_pass_regions": second_pass, "conf_sum": conf_sum, "words": words}
+
+
+def _merge_stats(stats):
+    total = _ocr_stats()
+    for st in stats:
+        for key in total:
+            total[key] += st[key]
+    return total
+
+
+def _reocr_block(page: Image.Image, block, lang: str):
+    """Second pass over one weak block: full preprocessing, single-block segmentation."""
+    left, top, right, bottom = block["bbox"]
+    pad = OCR_REGION_PADDING
+    crop = page.crop((max(0, left - pad), max(0, top - pad),
+                      min(page.width, right + pad), min(page.height, bottom + pad)))
+    retry = ocr_engine.image_to_blocks(preprocess(crop), lang=lang, psm=6)
+    if not retry:
+        return block
+    words = sum(b["words"] for b in retry)
+    conf = sum(b["conf"] * b["words"] for b in retry) / words
+    if conf <= block["conf"]:
+        return block
+    return {"text": "\n".join(b["text"] for b in retry), "conf": conf, "bbox": block["bbox"], "words": words}
+
+
+def _ocr_image(im: Image.Image, lang: str = "eng"):
+    """OCRs a freshly opened image. Returns (text, stats)."""
+    if OCR_MODE != "tiered":
+        return ocr_engine.image_to_string(preprocess(im), lang=lang, psm=6), _ocr_stats(regions=1)
+    page = normalize_resolution(im)
+    blocks = ocr_engine.image_to_blocks(page, lang=lang, psm=3)
+    if not blocks:
+        # Nothing legible at all on the fast pass: give the whole page the heavy treatment
+        return ocr_engine.image_to_string(preprocess(page), lang=lang, psm=6), _ocr_stats(1, 1)
+    second_pass = 0
+    for i, block in enumerate(blocks):
+        if block["conf"] < OCR_CONFIDENCE_THRESHOLD:
+            second_pass += 1
+            blocks[i] = _reocr_block(page, block, lang)
+    text = "\n\n".join(b["text"] for b in blocks)
+    stats = _ocr_stats(
+        len(blocks), second_pass,
+        sum(b["conf"] * b["words"] for b in blocks), sum(b["words"] for b in blocks),
+    )
+    return text, stats
+
+
+def _ocr_image_frame(image_path: str, frame: int = 0, lang: str = "eng"):
+    """OCRs one frame of an image file. Runs in a pool worker, reusing that worker's
+    Tesseract handle; only the requested frame is decoded."""
+    with Image.open(image_path) as im:
+        if frame:
+            im.seek(frame)
+        return _ocr_image(im, lang)
+
+
+def _join_pages(pages) -> str:
+    parts = [f"\n--- Page {i} ---\n{txt}" for i, txt in pages if txt]
+    return "\n".join(parts).strip()
+
+
+def _extract_page_range(pdf_path: str, start: int, stop: int):
+    """Extracts pages [start, stop) (0-based). Runs in a pool worker with its own reader."""
+    with open(pdf_path, "rb") as f:
+        reader = PdfReader(f)
+        return [
+            (i + 1, (reader.pages[i].extract_text() or "").strip())
+            for i in range(start, stop)
+        ]
+
+
+def _ocr_pdf_page(pdf_path: str, page_no: int, lang: str = "eng"):
+    """Rasterizes a single page (1-based) and OCRs it. Runs in a pool worker."""
+    images = convert_from_path(
+        pdf_path, dpi=PDF_OCR_DPI, first_page=page_no, last_page=page_no, grayscale=True
+    )
+    results = [_ocr_image(im, lang) for im in images]
+    return "\n".join(t.strip() for t, _ in results).strip(), _merge_stats(st for _, st in results)
+
+
+def _bounded_map(fn, calls, limit: int = PDF_WORKERS):
+    """pool.map over argument tuples with at most limit calls submitted at a time; results in order."""
+    pool = get_process_pool()
+    pending = deque()
+    for args in calls:
+        if len(pending) >= limit:
+            yield pending.popleft().result()
+        pending.append(pool.submit(fn, *args))
+    while pending:
+        yield pending.popleft().result()
+
+
+def _page_ranges(num_pages: int, workers: int):
+    size = max(1, math.ceil(num_pages / (workers * PDF_RANGES_PER_WORKER)))
+    return [(start, min(start + size, num_pages)) for start in range(0, num_pages, size)]
+
 
 class Extractor:
     def __init__(self, cache_dir: Path):
@@ -13,35 +145,86 @@ class Extractor:
     def _cache_path(self, fid: str) -> Path:
         return self.cache_dir / f"extract_{fid}.txt"
 
-    def from_pdf(self, pdf_path: str) -> str:
-        fid = file_fingerprint(pdf_path)
+    def _stats_path(self, fid: str) -> Path:
+        return self.cache_dir / f"ocr_{fid}.json"
+
+    def is_cached(self, fid: str) -> bool:
+        return self._cache_path(fid).exists()
+
+    def _save_ocr_stats(self, fid: str, stats):
+        if stats:
+            record = {**_merge_stats(stats), "mode": OCR_MODE}
+            self._stats_path(fid).write_text(json.dumps(record), encoding="utf-8")
+
+    def ocr_stats(self, fid: str):
+        """Per-document OCR stats, or None if the document needed no OCR."""
+        spath = self._stats_path(fid)
+        if not spath.exists():
+            return None
+        st = json.loads(spath.read_text(encoding="utf-8"))
+        return {
+            "mode": st["mode"],
+            "regions": st["regions"],
+            "second_pass_regions": st["second_pass_regions"],
+            "mean_confidence": round(st["conf_sum"] / st["words"], 1) if st["words"] else None,
+        }
+
+    def _pdf_pages(self, pdf_path: str):
+        """Returns [(page number, text)] in page order."""
+        with open(pdf_path, "rb") as f:
+            num_pages = len(PdfReader(f).pages)
+        if PDF_WORKERS <= 1 or num_pages < PDF_PARALLEL_MIN_PAGES:
+            return _extract_page_range(pdf_path, 0, num_pages)
+        ranges = _page_ranges(num_pages, PDF_WORKERS)
+        pages = []
+        # Results come back in submission order, so pages stay in document order
+        for part in _bounded_map(_extract_page_range, [(pdf_path, a, b) for a, b in ranges]):
+            pages.extend(part)
+        return pages
+
+    def _ocr_missing_pages(self, pdf_path: str, pages, lang: str = "eng"):
+        """OCRs only the pages without a usable text layer and merges them back in."""
+        scanned = [i for i, txt in pages if len(txt) < PDF_OCR_MIN_CHARS]
+        if not scanned or not PDF_OCR_FALLBACK:
+            return pages, []
+        if convert_from_path is None:
+            print(f"pdf2image is not installed; skipping OCR of {len(scanned)} scanned page(s)")
+            return pages, []
+        ocr = dict(zip(scanned, _bounded_map(_ocr_pdf_page, [(pdf_path, i, lang) for i in scanned])))
+        return [(i, ocr[i][0] if i in ocr and ocr[i][0] else txt) for i, txt in pages], [st for _, st in ocr.values()]
+
+    def from_pdf(self, pdf_path: str, fid: str = None) -> str:
+        fid = fid or file_fingerprint(pdf_path)
         cpath = self._cache_path(fid)
         if cpath.exists():
             return cpath.read_text(encoding="utf-8")
-        with open(pdf_path, "rb") as f:
-            reader = PdfReader(f)
-            parts = []
-            for i, page in enumerate(reader.pages, 1):
-                txt = (page.extract_text() or "").strip()
-                if txt:
-                    parts.append(f"\n--- Page {i} ---\n{txt}")
-            text = "\n".join(parts).strip() or ""
+        pages, stats = self._ocr_missing_pages(pdf_path, self._pdf_pages(pdf_path))
+        text = _join_pages(pages)
         if not text:
             text = "No readable text found."
+        self._save_ocr_stats(fid, stats)
         cpath.write_text(text, encoding="utf-8")
         return text
 
-    def from_image(self, image_path: str, lang: str = "eng") -> str:
-        fid = file_fingerprint(image_path)
+    def from_image(self, image_path: str, lang: str = "eng", fid: str = None) -> str:
+        fid = fid or file_fingerprint(image_path)
         cpath = self._cache_path(fid)
         if cpath.exists():
             return cpath.read_text(encoding="utf-8")
         with Image.open(image_path) as im:
-            if im.mode != "L":
-                im = im.convert("L")
-            im = ImageEnhance.Contrast(im).enhance(1.6)
-            im = ImageEnhance.Sharpness(im).enhance(1.8)
-            text = pytesseract.image_to_string(im, config="--oem 3 --psm 6", lang=lang)
+            # Multi-page TIFF faxes and animated GIFs; reading n_frames does not decode pixels
+            num_frames = getattr(im, "n_frames", 1)
+        if num_frames > 1:
+            # Each worker decodes only the frame it OCRs, so at most one frame per worker is in memory;
+            # like PDF pages, at most PDF_WORKERS frames are submitted at a time
+            frames = range(num_frames)
+            results = list(_bounded_map(_ocr_image_frame, [(image_path, i, lang) for i in frames]))
+            text = _join_pages((i + 1, t.strip()) for i, (t, _) in zip(frames, results))
+            stats = [st for _, st in results]
+        else:
+            text, st = get_process_pool().submit(_ocr_image_frame, image_path, 0, lang).result()
+            stats = [st]
         text = text or "No readable text found."
+        self._save_ocr_stats(fid, stats)
         cpath.write_text(text, encoding="utf-8")
         return text
@@ -2,36 +2,27 @@
 import os
 import uuid
 from google.cloud import firestore
-from passlib.context import CryptContext
-
-# --- Password Hashing Setup ---
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.services.passwords import verify_password, get_password_hash  # re-exported for existing callers
 
 # --- Firestore Initialization ---
 try:
     DB_PATH = os.path.join(os.path.dirname(__file__), '../../legal-firebase.json')
-    db = firestore.Client.from_service_account_json(DB_PATH)
+    if os.getenv("FIRESTORE_EMULATOR_HOST"):
+        # Local emulator (offline load tests): no service account needed
+        db = firestore.Client(project=os.getenv("FIREBASE_PROJECT_ID", "legal-470807"))
+    else:
+        db = firestore.Client.from_service_account_json(DB_PATH)
 except Exception as e:
     print(f"FATAL ERROR: Could not connect to Firestore. Check your 'legal-firebase.json' file. Details: {e}")
     db = None
 
-# --- Utility Functions ---
-def verify_password(plain_password, hashed_password):
-    """Verifies a plain password against a stored hash."""
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    """Hashes a plain-text password for safe storage."""
-    return pwd_context.hash(password)
-
 # --- User Management Functions ---
-def save_user(name, email, password):
-    """Saves a new user to the database with a hashed password."""
+def save_user(name, email, hashed_password):
+    """Saves a new user to the database. Hash the password with get_password_hash first."""
     if not db:
         raise ConnectionError("Firestore client is not initialized.")
     
     user_id = str(uuid.uuid4())
-    hashed_password = get_password_hash(password)
     
     db.collection("users").document(user_id).set({
         "name": name,
@@ -55,16 +46,41 @@ def get_user_by_email(email):
     return None
 
 # --- Document Management Functions ---
-def save_document_summary(user_id, doc_id, doc_name, summary_json):
-    """Saves a document's summary and metadata to Firestore."""
+# Documents are content-addressed: "documents/{doc_id}" holds the artifacts
+# shared by every upload of the same bytes, while "user_documents" records
+# which users uploaded which document and under what name.
+def save_document_summary(doc_id, summary_json):
+    """Saves a document's shared summary to Firestore."""
     if not db:
         raise ConnectionError("Firestore client is not initialized.")
         
     db.collection("documents").document(doc_id).set({
+        "doc_id": doc_id,
+        "summary": summary_json,
+        "upload_date": firestore.SERVER_TIMESTAMP
+    }, merge=True)
+
+def save_document_clauses(doc_id, clauses):
+    """Stores the clause detector's hits and naive risk score with a document."""
+    if not db:
+        raise ConnectionError("Firestore client is not initialized.")
+
+    db.collection("documents").document(doc_id).set({
+        "doc_id": doc_id,
+        "clause_hits": clauses["hits"],
+        "clause_counts": clauses["counts"],
+        "risk_score": clauses["risk_score"]
+    }, merge=True)
+
+def add_document_owner(user_id, doc_id, doc_name):
+    """Records that a user uploaded a document, keeping their own filename for it."""
+    if not db:
+        raise ConnectionError("Firestore client is not initialized.")
+
+    db.collection("user_documents").document(f"{user_id}_{doc_id}").set({
         "user_id": user_id,
         "doc_id": doc_id,
         "doc_name": doc_name,
-        "summary": summary_json,
         "upload_date": firestore.SERVER_TIMESTAMP
     })
 
@@ -76,12 +92,31 @@ def get_documents_by_user_id(user_id):
     if not user_id:
         return []
         
-    docs_ref = db.collection("documents")
-    query = docs_ref.where("user_id", "==", user_id).stream()
+    owned = {}
+    for doc in db.collection("user_documents").where("user_id", "==", user_id).stream():
+        data = doc.to_dict()
+        if data and data.get("doc_id"):
+            owned[data["doc_id"]] = data
+
     documents = []
+    if owned:
+        refs = [db.collection("documents").document(doc_id) for doc_id in owned]
+        for snap in db.get_all(refs):
+            shared = (snap.to_dict() or {}) if snap.exists else {}
+            data = owned[snap.id]
+            documents.append({
+                "doc_id": snap.id,
+                "doc_name": data.get("doc_name"),
+                "summary": shared.get("summary"),
+                "risk_score": shared.get("risk_score"),
+                "upload_date": data.get("upload_date")
+            })
+
+    # Documents saved before ownership moved to "user_documents"
+    query = db.collection("documents").where("user_id", "==", user_id).stream()
     for doc in query:
         data = doc.to_dict()
-        if data:  # This check prevents the "get" on None error
+        if data and data.get("doc_id") not in owned:  # This check prevents the "get" on None error
             documents.append({
                 "doc_id": data.get("doc_id"),
                 "doc_name": data.get("doc_name"),
@@ -90,6 +125,30 @@ def get_documents_by_user_id(user_id):
             })
     return documents
 
+# --- Analysis Cache ---
+# "analysis_cache/{key}" keeps generated reports keyed by content hash, prompt
+# version and model, so a new prompt or model never serves a stale report.
+def get_cached_analysis(key):
+    """Returns a cached analysis report, or None."""
+    if not db:
+        raise ConnectionError("Firestore client is not initialized.")
+
+    snap = db.collection("analysis_cache").document(key).get()
+    if not snap.exists:
+        return None
+    return (snap.to_dict() or {}).get("report")
+
+def save_cached_analysis(key, doc_id, report):
+    """Stores a generated analysis report under its cache key."""
+    if not db:
+        raise ConnectionError("Firestore client is not initialized.")
+
+    db.collection("analysis_cache").document(key).set({
+        "doc_id": doc_id,
+        "report": report,
+        "created_at": firestore.SERVER_TIMESTAMP
+    })
+
 def delete_document_by_id(document_id: str):
     """Deletes a document from Firestore by its ID."""
     if not db:
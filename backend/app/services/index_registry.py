@@ -0,0 +1,82 @@
+# backend/app/services/index_registry.py
+import asyncio
+from app.services import admission, vector_stores
+from app.services.document_processor import read_extracted_text
+from app.services.pools import run_io
+
+PENDING = "pending"
+BUILDING = "building"
+READY = "ready"
+# Extracted text had nothing long enough to index; there is no store, and none is needed
+EMPTY = "empty"
+FAILED = "failed"
+
+
+class IndexRegistry:
+    """Tracks the FAISS store of each document and runs at most one build per document.
+
+    The upload pipeline schedules a build as soon as a document is
+    extracted; anything that needs the store before it is ready (chat, the
+    context selector) awaits that same build instead of starting another.
+    """
+
+    def __init__(self):
+        self.states = {}
+        self.errors = {}
+        self._builds = {}
+
+    def state(self, doc_id: str):
+        """pending, building, ready, empty, failed, or None for a document never seen."""
+        if doc_id not in self.states and vector_stores.has_store(doc_id):
+            return READY
+        return self.states.get(doc_id)
+
+    def schedule(self, doc_id: str, text: str = None) -> asyncio.Task:
+        """Starts building the document's store in the background, unless it exists or is being built."""
+        task = self._builds.get(doc_id)
+        if task is None:
+            self.states[doc_id] = PENDING
+            self.errors.pop(doc_id, None)
+            task = self._builds[doc_id] = asyncio.ensure_future(self._build(doc_id, text))
+            task.add_done_callback(lambda t: self._finished(doc_id, t))
+        return task
+
+    def _finished(self, doc_id: str, task: asyncio.Task):
+        self._builds.pop(doc_id, None)
+        # A failed build nobody awaited is already recorded in states/errors
+        if not task.cancelled() and task.exception() is not None:
+            print(f"Index build failed for {doc_id}: {task.exception()}")
+
+    async def ensure(self, doc_id: str, text: str = None):
+        """Waits until the document's store is on disk, building it if nobody else is."""
+        if doc_id not in self._builds and vector_stores.has_store(doc_id):
+            self.states[doc_id] = READY
+            return
+        if self.states.get(doc_id) == EMPTY:
+            return
+        await asyncio.shield(self.schedule(doc_id, text))
+
+    async def _build(self, doc_id: str, text: str):
+        try:
+            if vector_stores.has_store(doc_id):
+                self.states[doc_id] = READY
+                return
+            if text is None:
+                text = await run_io(read_extracted_text, doc_id)
+            async with admission.slot("faiss_build"):
+                self.states[doc_id] = BUILDING
+                store = await run_io(vector_stores.build_store, doc_id, text)
+            self.states[doc_id] = READY if store is not None else EMPTY
+        except Exception as e:
+            self.states[doc_id] = FAILED
+            self.errors[doc_id] = str(e)
+            raise
+
+    def snapshot(self) -> dict:
+        counts = {PENDING: 0, BUILDING: 0, READY: 0, EMPTY: 0, FAILED: 0}
+        for state in self.states.values():
+            counts[state] += 1
+        return counts
+
+
+index_registry = IndexRegistry()
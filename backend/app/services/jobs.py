@@ -0,0 +1,221 @@
+# backend/app/services/jobs.py
+import os
+import json
+import time
+import uuid
+import asyncio
+from collections import OrderedDict
+from pathlib import Path
+from app.services.document_processor import extract_document, intake_stage
+from app.services.analysis_cache import analysis_cache
+from app.services import admission, metrics
+from app.services.index_registry import index_registry
+from app.services.pools import run_io, run_cpu, JOB_QUEUE_SIZE, JOB_STAGE_WORKERS
+from app.services.clause_detector import document_clauses
+from app.services.firestore_manager import (
+    save_document_summary,
+    save_document_clauses,
+    add_document_owner,
+)
+
+# Finished jobs kept in memory for GET /jobs/{id}
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", 1000))
+
+# Indexing starts right after extraction and runs alongside summarization;
+# "indexed" is reached when that build is done
+STAGES = ["extracted", "summarized", "indexed", "persisted"]
+
+
+class JobQueueFullError(admission.AdmissionRejected):
+    """Raised when the pipeline cannot accept another upload right now."""
+
+
+class Job:
+    def __init__(self, user_id: str, doc_id: str, meta: dict, path: Path):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.doc_id = doc_id
+        self.meta = meta
+        self.path = path
+        self.status = "queued"
+        self.stage = None
+        self.summary = None
+        self.clauses = None
+        self.error = None
+        self.created_at = time.time()
+        self.events = []
+        self._listeners = set()
+        self._record("queued")
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("completed", "failed")
+
+    def _record(self, event: str, **data):
+        entry = {"event": event, "job_id": self.id, "doc_id": self.doc_id, "at": time.time(), **data}
+        self.events.append(entry)
+        for queue in self._listeners:
+            queue.put_nowait(entry)
+
+    def advance(self, stage: str):
+        self.stage = stage
+        self.status = "completed" if stage == STAGES[-1] else "running"
+        self._record(stage)
+
+    def publish_section(self, name: str, value):
+        # Analysis sections are streamed to /jobs/{id}/events as soon as they are written
+        self._record("section", name=name, value=value)
+
+    def fail(self, error: Exception):
+        self.status = "failed"
+        self.error = str(error)
+        self._record("failed", error=self.error)
+
+    async def follow(self):
+        """Yields every event of the job, past ones first, until it finishes."""
+        queue = asyncio.Queue()
+        for entry in self.events:
+            queue.put_nowait(entry)
+        self._listeners.add(queue)
+        try:
+            while True:
+                entry = await queue.get()
+                yield entry
+                if entry["event"] in ("failed", STAGES[-1]):
+                    return
+        finally:
+            self._listeners.discard(queue)
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "doc_id": self.doc_id,
+            "status": self.status,
+            "stage": self.stage,
+            "stages": STAGES,
+            "meta": self.meta,
+            "summary": self.summary,
+            "error": self.error,
+        }
+
+
+# --- Stages ---
+async def _extract(job: Job):
+    stage = intake_stage(job.path.name)
+    admission.dequeue(stage)
+    async with admission.slot(stage):
+        job.meta.update(await run_io(extract_document, job.doc_id, job.path))
+        # Clause detection is one regex pass, cheap enough to run at ingest
+        job.clauses = await run_cpu(document_clauses, job.doc_id)
+    job.meta["risk_score"] = job.clauses["risk_score"]
+    index_registry.schedule(job.doc_id)
+
+
+async def _index(job: Job):
+    # Without an index the document can still be summarized, saved and listed
+    try:
+        await index_registry.ensure(job.doc_id)
+    except Exception as e:
+        print(f"Job {job.id}: indexing failed, continuing without an index: {e}")
+        job.meta["index_error"] = str(e)
+
+
+async def _summarize(job: Job):
+    # Identical bytes analysed before with the same prompt and model come from the cache
+    async for name, value in analysis_cache.stream(job.doc_id):
+        if name == "cached":
+            job.meta["summary_reused"] = value
+        elif name == "report":
+            job.summary = value
+        else:
+            job.publish_section(name, value)
+
+
+async def _persist(job: Job):
+    await run_io(save_document_summary, job.doc_id, job.summary)
+    await run_io(save_document_clauses, job.doc_id, job.clauses)
+    await run_io(add_document_owner, job.user_id, job.doc_id, job.meta.get("filename", ""))
+
+
+STAGE_HANDLERS = [_extract, _summarize, _index, _persist]
+
+
+class JobPipeline:
+    """Runs uploads through extract -> summarize -> index -> persist in the background.
+
+    Each stage has its own bounded queue and worker tasks, so a slow stage
+    (usually the LLM) holds jobs in front of it instead of letting them pile
+    up in memory.
+    """
+
+    def __init__(self, queue_size: int = JOB_QUEUE_SIZE, workers: int = JOB_STAGE_WORKERS):
+        self.queue_size = queue_size
+        self.workers = workers
+        self.jobs = OrderedDict()
+        self._queues = []
+        self._tasks = []
+
+    async def start(self):
+        self._queues = [asyncio.Queue(maxsize=self.queue_size) for _ in STAGES]
+        self._tasks = [
+            asyncio.create_task(self._run_stage(i))
+            for i in range(len(STAGES))
+            for _ in range(self.workers)
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, user_id: str, doc_id: str, meta: dict, path: Path) -> Job:
+        job = Job(user_id, doc_id, meta, path)
+        stage = intake_stage(path.name)
+        try:
+            self._queues[0].put_nowait(job)
+        except asyncio.QueueFull:
+            metrics.increment(f"admission.{stage}.rejected")
+            raise JobQueueFullError(stage, admission.gates[stage].retry_after(backlog=self.queue_size))
+        # Queued uploads count against the extraction/OCR gate until _extract reaches it
+        admission.enqueue(stage)
+        self.jobs[job.id] = job
+        self._forget_old_jobs()
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    def queue_depths(self) -> dict:
+        return {stage: queue.qsize() for stage, queue in zip(STAGES, self._queues)}
+
+    def _forget_old_jobs(self):
+        excess = len(self.jobs) - JOB_HISTORY
+        if excess > 0:
+            for job_id in [j for j, job in self.jobs.items() if job.finished][:excess]:
+                del self.jobs[job_id]
+
+    async def _run_stage(self, index: int):
+        queue = self._queues[index]
+        handler = STAGE_HANDLERS[index]
+        # Jobs already accepted wait for stage slots instead of being rejected
+        admission.run_without_rejection()
+        while True:
+            job = await queue.get()
+            try:
+                await handler(job)
+                job.advance(STAGES[index])
+                if index + 1 < len(STAGES):
+                    await self._queues[index + 1].put(job)
+            except Exception as e:
+                print(f"Job {job.id} failed during '{STAGES[index]}': {e}")
+                job.fail(e)
+            finally:
+                queue.task_done()
+
+
+def format_sse(entry: dict) -> str:
+    return f"event: {entry['event']}\ndata: {json.dumps(entry)}\n\n"
+
+
+pipeline = JobPipeline()
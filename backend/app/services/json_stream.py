@@ -0,0 +1,89 @@
+# backend/app/services/json_stream.py
+import json
+
+
+class JsonObjectStream:
+    """Incremental, tolerant parser for one top-level JSON object in model output.
+
+    Feed it text as it arrives; feed() returns the (key, value) members of
+    the object that completed in that piece. Text before the first "{" (prose,
+    ```json fences) and after the closing "}" is ignored, a trailing comma is
+    accepted and a member that is not valid JSON is skipped instead of failing
+    the whole response.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.result = {}
+        self.started = False
+        self.done = False
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start = None
+
+    def feed(self, text: str):
+        self.buffer += text
+        members = []
+        buf = self.buffer
+        while self._pos < len(buf) and not self.done:
+            ch = buf[self._pos]
+            if not self.started:
+                if ch == "{":
+                    self.started = True
+                    self._depth = 1
+                    self._member_start = self._pos + 1
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._take_member(self._pos, members)
+                    self.done = True
+            elif ch == "," and self._depth == 1:
+                self._take_member(self._pos, members)
+                self._member_start = self._pos + 1
+            self._pos += 1
+        return members
+
+    def _take_member(self, end: int, members: list):
+        raw = self.buffer[self._member_start:end].strip()
+        if not raw:
+            return
+        try:
+            member = json.loads("{" + raw + "}")
+        except ValueError:
+            print(f"Skipping malformed JSON member: {raw[:80]!r}")
+            return
+        for key, value in member.items():
+            self.result[key] = value
+            members.append((key, value))
+
+    def finish(self) -> dict:
+        """Returns every member parsed; an unterminated last member is dropped."""
+        if not self.started:
+            raise RuntimeError("Model did not return JSON.")
+        return self.result
+
+
+def parse_json_object(text: str) -> dict:
+    """json.loads with the tolerant stream parser as fallback for prose-wrapped or damaged output."""
+    try:
+        result = json.loads(text)
+        if isinstance(result, dict):
+            return result
+    except ValueError:
+        pass
+    parser = JsonObjectStream()
+    parser.feed(text)
+    return parser.finish()
@@ -0,0 +1,88 @@
+# backend/app/services/llm_clients.py
+import os
+import threading
+from pathlib import Path
+from google.oauth2 import service_account
+from app.services.llm_providers import LLM_PROVIDER, build_chat_model, provider_model_name
+
+GEMINI_PROJECT = os.getenv("GEMINI_PROJECT", "legal-470807")
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-2.5-flash-lite")
+GEMINI_TEMPERATURE = float(os.getenv("GEMINI_TEMPERATURE", 0.1))
+GEMINI_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_MAX_OUTPUT_TOKENS", 2048))
+DEFAULT_CREDENTIALS_PATH = Path(__file__).parent.parent / "gemini-api-key.json"
+CREDENTIALS_SCOPES = ["https://www.googleapis.com/auth/cloud-platform"]
+
+# Settings per use; each profile gets one long-lived client
+PROFILES = {
+    "summary": {
+        "model": GEMINI_MODEL_NAME,
+        "temperature": GEMINI_TEMPERATURE,
+        "max_output_tokens": GEMINI_MAX_OUTPUT_TOKENS,
+        "top_p": 0.95,
+        "top_k": 40,
+    },
+    "chat": {
+        "model": os.getenv("GEMINI_CHAT_MODEL_NAME", GEMINI_MODEL_NAME),
+        "temperature": GEMINI_TEMPERATURE,
+        "max_output_tokens": int(os.getenv("GEMINI_CHAT_MAX_OUTPUT_TOKENS", 1024)),
+        "top_p": 0.95,
+        "top_k": 40,
+    },
+}
+
+_clients = {}
+_credentials = None
+_lock = threading.Lock()
+
+
+def load_credentials():
+    """Loads the service account once. Returns None to fall back to application default credentials."""
+    global _credentials
+    if _credentials is None:
+        for candidate in (os.getenv("GOOGLE_APPLICATION_CREDENTIALS"), DEFAULT_CREDENTIALS_PATH):
+            if candidate and Path(candidate).exists():
+                _credentials = service_account.Credentials.from_service_account_file(
+                    str(candidate), scopes=CREDENTIALS_SCOPES
+                )
+                break
+    return _credentials
+
+
+def model_name(profile: str) -> str:
+    return provider_model_name(PROFILES[profile])
+
+
+def build_client(profile: str):
+    """Constructs a fresh client for a profile from LLM_PROVIDER; request paths should use get_llm instead."""
+    credentials = load_credentials() if LLM_PROVIDER == "vertex" else None
+    return build_chat_model(profile, PROFILES[profile], GEMINI_PROJECT, credentials)
+
+
+def get_llm(profile: str):
+    """Returns the shared client for a profile, creating it on first use.
+
+    Clients keep their gRPC channel and refreshed auth token between calls,
+    so requests skip construction, token fetches and TLS handshakes.
+    """
+    client = _clients.get(profile)
+    if client is None:
+        with _lock:
+            client = _clients.get(profile)
+            if client is None:
+                client = _clients[profile] = build_client(profile)
+    return client
+
+
+def init_clients():
+    """Creates every profile's client up front (called at startup)."""
+    for profile in PROFILES:
+        get_llm(profile)
+
+
+def response_text(resp) -> str:
+    """Text of a model response: an AIMessage (AIMessageChunk when streaming), a {"text": ...} dict or anything else."""
+    if hasattr(resp, "content"):
+        return resp.content
+    if isinstance(resp, dict) and "text" in resp:
+        return resp["text"]
+    return str(resp)
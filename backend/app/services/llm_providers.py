@@ -0,0 +1,164 @@
+# backend/app/services/llm_providers.py
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import hashlib
+
+# vertex (default), openai, transformers or fake
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "vertex")
+OPENAI_MODEL_NAME = os.getenv("OPENAI_MODEL_NAME", "gpt-4o-mini")
+LOCAL_LLM_MODEL = os.getenv("LOCAL_LLM_MODEL", "google/flan-t5-base")
+
+# Fake provider: lognormal time-to-first-token, then tokens at a jittered rate
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", 400))
+FAKE_LLM_LATENCY_SIGMA = float(os.getenv("FAKE_LLM_LATENCY_SIGMA", 0.5))
+FAKE_LLM_TOKENS_PER_SEC = float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", 150))
+FAKE_LLM_RATE_JITTER = float(os.getenv("FAKE_LLM_RATE_JITTER", 0.2))
+# Fraction of calls that fail the way a Vertex quota error does
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", 0))
+FAKE_LLM_SEED = os.getenv("FAKE_LLM_SEED", "0")
+# Optional JSON file of {"summary": "...", "chat": "..."} replacing the canned replies
+FAKE_LLM_SCRIPT = os.getenv("FAKE_LLM_SCRIPT")
+
+FAKE_REPLIES = {
+    "summary": json.dumps({
+        "summary": ["This agreement sets out a loan repaid in monthly installments with late fees on missed payments."],
+        "key_terms": ["Principal", "Installment", "Late fee", "Default interest"],
+        "obligations": {"you": ["Pay each installment by the due date"], "other_party": ["Provide statements on request"]},
+        "costs_and_payments": ["Monthly installment", "Late fee of 5% per missed payment"],
+        "risks": [{"title": "Default interest", "why_it_matters": "Missed payments may increase the total cost.",
+                   "where_found": "Page 1", "mitigations": ["Set up automatic payments"]}],
+        "red_flags": ["Disputes go to binding arbitration"],
+        "questions_to_ask": ["Can the late fee be capped?"],
+        "negotiation_suggestions": ["Ask for a grace period before late fees apply"],
+        "decision_assist": {"pros": ["Predictable payments"], "cons": ["Penalties on late payment"],
+                            "overall_take": "The terms appear standard but the penalties could add up."},
+    }),
+    "chat": (
+        "Based on the document, the borrower must pay each installment on time; a late fee "
+        "may apply to payments received after the due date, and disputes appear to go to arbitration."
+    ),
+}
+
+
+class FakeMessage:
+    """Stands in for the AIMessage / AIMessageChunk the real providers return."""
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeChatModel:
+    """Deterministic offline LLM: canned replies with realistic latency.
+
+    Reply text and timing depend only on the seed and the prompt, so a load
+    test replays the same way every run. Exposes the parts of the LangChain
+    chat model interface the app uses: invoke, ainvoke and astream.
+    """
+
+    def __init__(self, profile: str, reply: str = None, latency_ms: float = FAKE_LLM_LATENCY_MS,
+                 latency_sigma: float = FAKE_LLM_LATENCY_SIGMA, tokens_per_sec: float = FAKE_LLM_TOKENS_PER_SEC,
+                 rate_jitter: float = FAKE_LLM_RATE_JITTER, error_rate: float = FAKE_LLM_ERROR_RATE,
+                 seed: str = FAKE_LLM_SEED):
+        self.profile = profile
+        self.reply = reply if reply is not None else FAKE_REPLIES.get(profile, FAKE_REPLIES["chat"])
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.tokens_per_sec = tokens_per_sec
+        self.rate_jitter = rate_jitter
+        self.error_rate = error_rate
+        self.seed = seed
+
+    def _plan(self, prompt):
+        """Returns (seconds to first token, seconds per token, tokens)."""
+        digest = hashlib.sha256(str(prompt).encode("utf-8")).hexdigest()
+        rnd = random.Random(f"{self.seed}:{digest}")
+        if rnd.random() < self.error_rate:
+            from google.api_core.exceptions import ResourceExhausted
+            raise ResourceExhausted("Fake provider: quota exceeded")
+        first = rnd.lognormvariate(math.log(max(self.latency_ms, 1e-3) / 1000), self.latency_sigma)
+        rate = max(1.0, rnd.gauss(self.tokens_per_sec, self.tokens_per_sec * self.rate_jitter))
+        # Whitespace-split words with their separators, so the joined stream equals the reply
+        tokens = [w + " " for w in self.reply.split(" ")]
+        tokens[-1] = tokens[-1][:-1]
+        return first, 1 / rate, tokens
+
+    def invoke(self, prompt, **kwargs):
+        first, per_token, tokens = self._plan(prompt)
+        time.sleep(first + per_token * len(tokens))
+        return FakeMessage(self.reply)
+
+    async def ainvoke(self, prompt, **kwargs):
+        first, per_token, tokens = self._plan(prompt)
+        await asyncio.sleep(first + per_token * len(tokens))
+        return FakeMessage(self.reply)
+
+    async def astream(self, prompt, **kwargs):
+        first, per_token, tokens = self._plan(prompt)
+        await asyncio.sleep(first)
+        for token in tokens:
+            yield FakeMessage(token)
+            await asyncio.sleep(per_token)
+
+
+def _build_vertex(profile: str, settings: dict, project: str, credentials):
+    from langchain_google_vertexai import ChatVertexAI
+    return ChatVertexAI(project=project, credentials=credentials, **settings)
+
+
+def _build_openai(profile: str, settings: dict, project: str, credentials):
+    try:
+        from langchain_openai import ChatOpenAI
+    except ImportError:
+        raise RuntimeError("LLM_PROVIDER=openai needs the langchain-openai package.")
+    return ChatOpenAI(
+        model=OPENAI_MODEL_NAME,
+        temperature=settings["temperature"],
+        max_tokens=settings["max_output_tokens"],
+        top_p=settings["top_p"],
+    )
+
+
+def _build_transformers(profile: str, settings: dict, project: str, credentials):
+    from langchain_huggingface import HuggingFacePipeline
+    return HuggingFacePipeline.from_model_id(
+        model_id=LOCAL_LLM_MODEL,
+        task="text2text-generation",
+        pipeline_kwargs={"max_new_tokens": settings["max_output_tokens"]},
+    )
+
+
+def _build_fake(profile: str, settings: dict, project: str, credentials):
+    reply = None
+    if FAKE_LLM_SCRIPT:
+        with open(FAKE_LLM_SCRIPT, encoding="utf-8") as f:
+            reply = json.load(f).get(profile)
+    return FakeChatModel(profile, reply=reply)
+
+
+PROVIDERS = {
+    "vertex": _build_vertex,
+    "openai": _build_openai,
+    "transformers": _build_transformers,
+    "fake": _build_fake,
+}
+
+
+def provider_model_name(settings: dict, provider: str = LLM_PROVIDER) -> str:
+    """Name of the model a provider will answer with (part of the analysis cache key)."""
+    if provider == "vertex":
+        return settings["model"]
+    if provider == "openai":
+        return f"openai:{OPENAI_MODEL_NAME}"
+    if provider == "transformers":
+        return f"transformers:{LOCAL_LLM_MODEL}"
+    return f"{provider}:{FAKE_LLM_SEED}"
+
+
+def build_chat_model(profile: str, settings: dict, project: str, credentials, provider: str = LLM_PROVIDER):
+    if provider not in PROVIDERS:
+        raise ValueError(f"Unknown LLM_PROVIDER '{provider}'; expected one of {', '.join(PROVIDERS)}.")
+    return PROVIDERS[provider](profile, settings, project, credentials)
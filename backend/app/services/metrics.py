@@ -0,0 +1,69 @@
+# backend/app/services/metrics.py
+import threading
+from collections import deque
+
+# Recent observations kept per latency series for percentiles
+LATENCY_WINDOW = 2048
+
+
+class LatencyStats:
+    """Count, mean and percentiles (over a sliding window) of observed durations."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self.recent.append(seconds)
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            recent = sorted(self.recent)
+        pct = lambda q: recent[min(len(recent) - 1, int(q * len(recent)))] * 1000 if recent else 0.0  # noqa: E731
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean * 1000, 2),
+            "p50_ms": round(pct(0.50), 2),
+            "p95_ms": round(pct(0.95), 2),
+            "p99_ms": round(pct(0.99), 2),
+            "max_ms": round(self.max * 1000, 2),
+        }
+
+
+_latencies = {}
+_counters = {}
+_registry_lock = threading.Lock()
+
+
+def latency(name: str) -> LatencyStats:
+    with _registry_lock:
+        stats = _latencies.get(name)
+        if stats is None:
+            stats = _latencies[name] = LatencyStats()
+        return stats
+
+
+def increment(name: str, amount: int = 1):
+    with _registry_lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def snapshot() -> dict:
+    with _registry_lock:
+        latencies = dict(_latencies)
+        counters = dict(_counters)
+    return {
+        "latency": {name: stats.snapshot() for name, stats in sorted(latencies.items())},
+        "counters": dict(sorted(counters.items())),
+    }
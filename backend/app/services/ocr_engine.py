@@ -0,0 +1,128 @@
+# backend/app/services/ocr_engine.py
+import os
+import threading
+from PIL import Image
+import pytesseract
+from pytesseract import Output
+
+try:
+    import tesserocr
+except ImportError:  # libtesseract bindings are optional; pytesseract is the fallback
+    tesserocr = None
+
+# "tesserocr" keeps a loaded Tesseract API per worker; "pytesseract" forks the CLI per image
+OCR_ENGINE = os.getenv("OCR_ENGINE", "tesserocr")
+TESSDATA_PREFIX = os.getenv("TESSDATA_PREFIX")
+
+_local = threading.local()
+_fallback_reported = False
+
+
+def _report_fallback(reason):
+    global _fallback_reported
+    if not _fallback_reported:
+        print(f"In-process OCR unavailable ({reason}); falling back to pytesseract")
+        _fallback_reported = True
+
+
+def _get_api(lang: str, psm: int):
+    """Returns this thread's Tesseract handle for (lang, psm), loading the model once."""
+    apis = getattr(_local, "apis", None)
+    if apis is None:
+        apis = _local.apis = {}
+    api = apis.get((lang, psm))
+    if api is None:
+        kwargs = {"lang": lang, "psm": psm, "oem": tesserocr.OEM.DEFAULT}
+        if TESSDATA_PREFIX:
+            kwargs["path"] = TESSDATA_PREFIX
+        api = apis[(lang, psm)] = tesserocr.PyTessBaseAPI(**kwargs)
+    return api
+
+
+def use_inprocess() -> bool:
+    return tesserocr is not None and OCR_ENGINE == "tesserocr"
+
+
+def image_to_string(im: Image.Image, lang: str = "eng", psm: int = 6) -> str:
+    """OCRs an in-memory image with --oem 3 and the given page segmentation mode."""
+    if use_inprocess():
+        try:
+            api = _get_api(lang, psm)
+        except RuntimeError as e:
+            _report_fallback(e)
+        else:
+            api.SetImage(im)
+            return api.GetUTF8Text()
+    elif OCR_ENGINE == "tesserocr":
+        _report_fallback("tesserocr is not installed")
+    return pytesseract.image_to_string(im, config=f"--oem 3 --psm {psm}", lang=lang)
+
+
+def _blocks_inprocess(im: Image.Image, lang: str, psm: int):
+    api = _get_api(lang, psm)
+    api.SetImage(im)
+    api.Recognize()
+    level = tesserocr.RIL.WORD
+    blocks = []
+    for word in tesserocr.iterate_level(api.GetIterator(), level):
+        text = word.GetUTF8Text(level)
+        if not blocks or word.IsAtBeginningOf(tesserocr.RIL.BLOCK):
+            blocks.append({"lines": [], "confs": [], "boxes": []})
+        block = blocks[-1]
+        if not block["lines"] or word.IsAtBeginningOf(tesserocr.RIL.TEXTLINE):
+            block["lines"].append([])
+        if text and text.strip():
+            block["lines"][-1].append(text.strip())
+            block["confs"].append(word.Confidence(level))
+            block["boxes"].append(word.BoundingBox(level))
+    return blocks
+
+
+def _blocks_pytesseract(im: Image.Image, lang: str, psm: int):
+    data = pytesseract.image_to_data(
+        im, config=f"--oem 3 --psm {psm}", lang=lang, output_type=Output.DICT
+    )
+    blocks = {}
+    for i, text in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not text.strip():
+            continue
+        block = blocks.setdefault(data["block_num"][i], {"lines": {}, "confs": [], "boxes": []})
+        block["lines"].setdefault((data["par_num"][i], data["line_num"][i]), []).append(text.strip())
+        block["confs"].append(conf)
+        left, top = data["left"][i], data["top"][i]
+        block["boxes"].append((left, top, left + data["width"][i], top + data["height"][i]))
+    for block in blocks.values():
+        block["lines"] = list(block["lines"].values())
+    return [blocks[k] for k in sorted(blocks)]
+
+
+def image_to_blocks(im: Image.Image, lang: str = "eng", psm: int = 3):
+    """OCRs an image and groups the words by Tesseract layout block.
+
+    Returns [{"text", "conf", "bbox", "words"}], with conf the mean word
+    confidence (0-100) and bbox (left, top, right, bottom) in image pixels.
+    """
+    raw = None
+    if use_inprocess():
+        try:
+            raw = _blocks_inprocess(im, lang, psm)
+        except RuntimeError as e:
+            _report_fallback(e)
+    if raw is None:
+        raw = _blocks_pytesseract(im, lang, psm)
+    blocks = []
+    for b in raw:
+        if not b["confs"]:
+            continue
+        boxes = b["boxes"]
+        blocks.append({
+            "text": "\n".join(" ".join(words) for words in b["lines"] if words),
+            "conf": sum(b["confs"]) / len(b["confs"]),
+            "bbox": (
+                min(x[0] for x in boxes), min(x[1] for x in boxes),
+                max(x[2] for x in boxes), max(x[3] for x in boxes),
+            ),
+            "words": len(b["confs"]),
+        })
+    return blocks
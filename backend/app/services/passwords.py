@@ -0,0 +1,14 @@
+# backend/app/services/passwords.py
+# Kept apart from firestore_manager so hashing needs no Firestore client.
+from passlib.context import CryptContext
+
+# --- Password Hashing Setup ---
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+def verify_password(plain_password, hashed_password):
+    """Verifies a plain password against a stored hash."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+def get_password_hash(password):
+    """Hashes a plain-text password for safe storage."""
+    return pwd_context.hash(password)
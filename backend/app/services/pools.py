@@ -0,0 +1,63 @@
+# backend/app/services/pools.py
+import os
+import asyncio
+import threading
+import functools
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Worker processes shared by CPU-heavy extraction work
+CPU_WORKERS = int(os.getenv("CPU_WORKERS", os.cpu_count() or 1))
+# "spawn" keeps children clear of the locks held by the server's threads at fork time
+CPU_POOL_START_METHOD = os.getenv("CPU_POOL_START_METHOD", "spawn")
+# Threads for blocking I/O: Firestore, disk, FAISS loads and searches
+IO_THREADS = int(os.getenv("IO_THREADS", 32))
+# Background job pipeline: jobs waiting in front of each stage (a full stage makes the one
+# before it wait) and concurrent workers per stage. Kept here because the admission gates
+# of the intake stages are sized from them too.
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", 16))
+JOB_STAGE_WORKERS = int(os.getenv("JOB_STAGE_WORKERS", 2))
+
+_process_pool = None
+_thread_pool = None
+_pool_lock = threading.Lock()
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Returns the process pool, starting it on first use."""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(
+                max_workers=CPU_WORKERS,
+                mp_context=multiprocessing.get_context(CPU_POOL_START_METHOD),
+            )
+        return _process_pool
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    """Returns the I/O thread pool, starting it on first use."""
+    global _thread_pool
+    with _pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="io")
+        return _thread_pool
+
+async def run_cpu(fn, *args, **kwargs):
+    """Runs CPU-bound fn in the process pool. fn and its arguments must be picklable."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), functools.partial(fn, *args, **kwargs))
+
+async def run_io(fn, *args, **kwargs):
+    """Runs blocking I/O (or work that orchestrates the process pool) in the thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(), functools.partial(fn, *args, **kwargs))
+
+def shutdown_pools():
+    """Stops the pools; the next get_*_pool() call starts fresh ones."""
+    global _process_pool, _thread_pool
+    with _pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=True, cancel_futures=True)
+            _process_pool = None
+        if _thread_pool is not None:
+            _thread_pool.shutdown(wait=True, cancel_futures=True)
+            _thread_pool = None
@@ -0,0 +1,125 @@
+# backend/app/services/preprocess.py
+import os
+from PIL import Image, ImageEnhance, ImageFilter
+
+try:
+    import numpy as np
+except ImportError:  # without NumPy only the ImageEnhance chain is available
+    np = None
+
+# "numpy" runs resolution normalization, adaptive binarization and deskew;
+# "enhance" is the original Contrast/Sharpness chain
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "numpy")
+# Images are scaled towards this resolution when their DPI is known...
+OCR_TARGET_DPI = int(os.getenv("OCR_TARGET_DPI", 300))
+OCR_MAX_UPSCALE = float(os.getenv("OCR_MAX_UPSCALE", 2.0))
+# ...and never kept larger than this on their long side (A4 at 300 DPI)
+OCR_MAX_SIDE = int(os.getenv("OCR_MAX_SIDE", 3508))
+# Bradley-Roth threshold: a pixel is ink if it is this much darker than its neighbourhood mean
+OCR_BINARIZE_T = float(os.getenv("OCR_BINARIZE_T", 0.15))
+OCR_BINARIZE_WINDOW = 1 / 16  # neighbourhood size as a fraction of the image width
+OCR_DESKEW_MAX_ANGLE = float(os.getenv("OCR_DESKEW_MAX_ANGLE", 5.0))
+OCR_DESKEW_STEP = 0.25
+OCR_DESKEW_MIN_ANGLE = 0.3
+# Skew is estimated on a view decimated to roughly this width
+DESKEW_SAMPLE_WIDTH = 800
+
+
+def enhance(im: Image.Image) -> Image.Image:
+    """The original chain: grayscale, Contrast 1.6, Sharpness 1.8."""
+    if im.mode != "L":
+        im = im.convert("L")
+    im = ImageEnhance.Contrast(im).enhance(1.6)
+    return ImageEnhance.Sharpness(im).enhance(1.8)
+
+
+def _dpi(im: Image.Image):
+    dpi = im.info.get("dpi")
+    return float(dpi[0] if isinstance(dpi, tuple) else dpi) if dpi else None
+
+
+def _target_scale(im: Image.Image) -> float:
+    dpi = _dpi(im)
+    scale = min(OCR_TARGET_DPI / dpi, OCR_MAX_UPSCALE) if dpi else 1.0
+    return min(scale, OCR_MAX_SIDE / max(im.size))
+
+
+def normalize_resolution(im: Image.Image) -> Image.Image:
+    """Grayscale image scaled to OCR_TARGET_DPI and capped at OCR_MAX_SIDE.
+
+    Call on a freshly opened image: for JPEGs draft() lets the decoder skip
+    straight to a 1/2, 1/4 or 1/8 scale, so a 12 MP photo is never fully decoded.
+    """
+    dpi = _dpi(im)
+    scale = _target_scale(im)
+    size = (max(1, round(im.width * scale)), max(1, round(im.height * scale)))
+    if scale < 1:
+        im.draft("L", size)
+    if im.mode != "L":
+        im = im.convert("L")
+    if im.size != size:
+        im = im.resize(size, Image.LANCZOS if scale > 1 else Image.BOX, reducing_gap=2.0)
+    if dpi:
+        # Record the new resolution; crops inherit it and are not scaled a second time
+        im.info["dpi"] = (dpi * scale, dpi * scale)
+    return im
+
+
+def _threshold_lut():
+    # Pixel values above lut[mean] are paper: mean * (1 - t), floored, for every 8-bit mean
+    keep = 100 - round(OCR_BINARIZE_T * 100)
+    return [mean * keep // 100 for mean in range(256)]
+
+
+def binarize(im: Image.Image):
+    """Bradley-Roth adaptive threshold of a grayscale image, as a uint8 array (ink=0, paper=255).
+
+    The neighbourhood mean comes from PIL's BoxBlur, in C, and a lookup table
+    turns it into the per-pixel threshold; every intermediate is one byte per pixel.
+    """
+    r = max(1, int(im.width * OCR_BINARIZE_WINDOW) // 2)
+    threshold = np.asarray(im.filter(ImageFilter.BoxBlur(r)).point(_threshold_lut()))
+    paper = np.greater(np.asarray(im), threshold).view(np.uint8)
+    paper *= 255
+    return paper
+
+
+def estimate_skew(a) -> float:
+    """Angle in degrees that straightens the text lines of a binarized array.
+
+    Scores candidate angles by how peaky the row projection of the ink pixels
+    gets once rotated, on a decimated view of the image.
+    """
+    step = max(1, a.shape[1] // DESKEW_SAMPLE_WIDTH)
+    ys, xs = np.nonzero(a[::step, ::step] == 0)
+    if ys.size < 100:
+        return 0.0
+    ys = ys.astype(np.float32)
+    xs = xs.astype(np.float32)
+    best_angle, best_score = 0.0, -1.0
+    for angle in np.arange(-OCR_DESKEW_MAX_ANGLE, OCR_DESKEW_MAX_ANGLE + 1e-6, OCR_DESKEW_STEP):
+        theta = np.deg2rad(angle)
+        rows = (ys * np.cos(theta) + xs * np.sin(theta)).astype(np.int32)
+        hist = np.bincount(rows - rows.min())
+        score = float(np.dot(hist, hist))
+        if score > best_score:
+            best_angle, best_score = float(angle), score
+    return best_angle
+
+
+def adaptive(im: Image.Image) -> Image.Image:
+    """Resolution normalization, adaptive binarization and deskew."""
+    im = normalize_resolution(im)
+    a = binarize(im)
+    angle = estimate_skew(a)
+    out = Image.fromarray(a)
+    if abs(angle) >= OCR_DESKEW_MIN_ANGLE:
+        out = out.rotate(-angle, resample=Image.NEAREST, expand=True, fillcolor=255)
+    return out
+
+
+def preprocess(im: Image.Image) -> Image.Image:
+    """Prepares a freshly opened image for Tesseract according to OCR_PREPROCESS."""
+    if OCR_PREPROCESS != "numpy" or np is None:
+        return enhance(im)
+    return adaptive(im)
@@ -1,138 +1,169 @@
 # backend/app/services/qa_engine.py
 from app.services.summarizer import chunk_text
 from app.models import AnalysisReport
-from pathlib import Path
+import os
 import json
-from langchain_google_vertexai import ChatVertexAI
+import asyncio
 from langchain.prompts import PromptTemplate
-from langchain.chains import LLMChain
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
-import os
-
-# Load the embedding model once globally
-EMBED_MODEL = HuggingFaceEmbeddings(
-    model_name="nlpaueb/legal-bert-base-uncased",
-    model_kwargs={"device": "cpu"},
-    encode_kwargs={"normalize_embeddings": True, "batch_size": 64},
-)
+from app.services.vector_stores import load_store, load_user_store, aencode_query, cached_query_embedding
+from app.services.pools import run_io
+from app.services.index_registry import index_registry, READY
+from app.services.document_processor import extractor, read_extracted_text
+from app.services import admission, llm_clients
 
 from collections import defaultdict, deque
 
+# Chunks retrieved per question, across all of the user's documents
+CHAT_TOP_K = int(os.getenv("CHAT_TOP_K", 6))
+
 # In-memory user chat history (user_id -> deque of last 10 queries)
 USER_CHAT_HISTORY = defaultdict(lambda: deque(maxlen=10))
 
-# New: Chat with all documents for a user
-async def chat_with_documents(doc_ids, query, user_id=None):
+ASSISTANT_ROLE = (
+    "You are a legal assistant AI specialized in simplifying complex legal documents. "
+    "Your role is to help users understand rental agreements, loan contracts, terms of service, "
+    "and other legal documents by providing clear summaries, explaining complex clauses, "
+    "and answering questions in simple, practical language.\n\n"
+)
+
+MULTI_DOC_PROMPT = PromptTemplate(
+    input_variables=["context", "question"],
+    template=ASSISTANT_ROLE + "CONTEXT:\n{context}\n\nQUESTION:\n{question}\n\nAnswer concisely and only to the last question.",
+)
+
+SINGLE_DOC_PROMPT = PromptTemplate(
+    input_variables=["context", "question"],
+    template=ASSISTANT_ROLE + "CONTEXT:\n{context}\n\nQUESTION: {question}\n\nAnswer:",
+)
+
+async def _open_store(doc_id: str, text: str):
+    # Waits for the upload pipeline's build if it is still running, builds only if nobody has
+    await index_registry.ensure(doc_id, text)
+    return await run_io(load_store, doc_id)
+
+
+async def _embed(query: str):
+    # Repeated questions come from the cache without waiting for the encoder
+    vector = cached_query_embedding(query)
+    if vector is None:
+        async with admission.slot("embedding"):
+            vector = await aencode_query(query)
+    return vector
+
+
+async def _search(store, query: str, k: int, doc_ids=None):
+    vector = await _embed(query)
+    # Filtering happens after the search, so look at every chunk to keep the top-k exact
+    kwargs = {"filter": {"doc_id": list(doc_ids)}, "fetch_k": store.index.ntotal} if doc_ids else {}
+    return await run_io(store.similarity_search_with_score_by_vector, vector, k=k, **kwargs)
+
+
+async def _index_missing(doc_ids):
+    """Waits, all at once, for the stores that are missing or still being built.
+
+    Returns the doc_ids whose build failed; they are left out of the search
+    instead of failing the question.
+    """
+    waiting = [
+        doc_id for doc_id in doc_ids
+        if index_registry.state(doc_id) != READY and extractor.is_cached(doc_id)
+    ]
+    results = await asyncio.gather(*[index_registry.ensure(doc_id) for doc_id in waiting], return_exceptions=True)
+    failed = set()
+    for doc_id, result in zip(waiting, results):
+        if isinstance(result, admission.AdmissionRejected):
+            raise result
+        if isinstance(result, Exception):
+            print(f"Leaving {doc_id} out of the search, its index could not be built: {result}")
+            failed.add(doc_id)
+    return failed
+
+
+NO_CONTEXT_ANSWER = "No relevant information found in your documents."
+
+
+def _remember(user_id, query):
     # Store the query in user history
     if user_id:
         USER_CHAT_HISTORY[user_id].append(query)
         # Build context from last 10 queries
-        memory_context = "\n".join(USER_CHAT_HISTORY[user_id])
-    else:
-        memory_context = query
-    all_context = []
-    for doc_id in doc_ids:
-        cache_path = Path("../cache") / f"extract_{doc_id}.txt"
-        if not cache_path.exists():
-            continue
-        text = cache_path.read_text(encoding="utf-8")
-        emb = EMBED_MODEL  # Use global model
-        vs_path = Path("../data") / f"vs_hf-legal-bert_{doc_id}"
-        if vs_path.exists():
-            store = FAISS.load_local(vs_path.as_posix(), emb, allow_dangerous_deserialization=True)
-        else:
-            from langchain.text_splitter import RecursiveCharacterTextSplitter
-            splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-            docs = splitter.create_documents([text])
-            docs = [d for d in docs if len(d.page_content.strip()) >= 40]
-            store = FAISS.from_documents(docs, emb)
-            store.save_local(vs_path.as_posix())
-        results = store.similarity_search_with_score(memory_context, k=3)
-        context = "\n\n".join([doc.page_content.strip() for doc, score in results if score >= 0.2])
-        if context:
-            all_context.append(context)
-    combined_context = "\n\n".join(all_context)
+        return "\n".join(USER_CHAT_HISTORY[user_id])
+    return query
+
+
+async def retrieve_context(doc_ids, search_query, owner="shared", selected=None, k=CHAT_TOP_K):
+    """Finds the k chunks closest to search_query across all of doc_ids.
+
+    One search over the owner's unified store, optionally restricted to the
+    selected documents, gives a global top-k instead of k per document.
+    Returns (combined context text, sources) where sources lists, per document
+    that contributed, its doc_id and the scores of the chunks used.
+    """
+    if selected:
+        selected = [doc_id for doc_id in selected if doc_id in set(doc_ids)]
+        if not selected:
+            return "", []
+    failed = await _index_missing(doc_ids)
+    doc_ids = [doc_id for doc_id in doc_ids if doc_id not in failed]
+    store = await run_io(load_user_store, owner, doc_ids)
+    if store is None:
+        return "", []
+    results = await _search(store, search_query, k=k, doc_ids=selected)
+    hits = [(doc, score) for doc, score in results if score >= 0.2]
+    scores = {}
+    for doc, score in hits:
+        scores.setdefault(doc.metadata["doc_id"], []).append(round(float(score), 4))
+    sources = [{"doc_id": doc_id, "scores": doc_scores} for doc_id, doc_scores in scores.items()]
+    return "\n\n".join(doc.page_content.strip() for doc, score in hits), sources
+
+
+# New: Chat with all documents for a user
+async def chat_with_documents(doc_ids, query, user_id=None, owner="shared", selected=None):
+    memory_context = _remember(user_id, query)
+    combined_context, _ = await retrieve_context(doc_ids, memory_context, owner, selected)
     if not combined_context:
-        return "No relevant information found in your documents."
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(Path(__file__).parent.parent / "gemini-api-key.json")
-    llm = ChatVertexAI(
-        model="gemini-2.5-flash-lite",
-        temperature=0.1,
-        max_output_tokens=1024,
-        top_p=0.95,
-        top_k=40,
-        project="legal-470807",
-    )
+        return NO_CONTEXT_ANSWER
+    llm = llm_clients.get_llm("chat")
     # Only answer the last query, but use history for context
     last_query = query if not user_id else USER_CHAT_HISTORY[user_id][-1] if USER_CHAT_HISTORY[user_id] else query
-    prompt = PromptTemplate(
-        input_variables=["context", "question"],
-        template=(
-            "You are a legal assistant AI specialized in simplifying complex legal documents. "
-            "Your role is to help users understand rental agreements, loan contracts, terms of service, "
-            "and other legal documents by providing clear summaries, explaining complex clauses, "
-            "and answering questions in simple, practical language.\n\n"
-            "CONTEXT:\n{context}\n\nQUESTION:\n{question}\n\nAnswer concisely and only to the last question."
-        ),
-    )
-    chain = LLMChain(llm=llm, prompt=prompt)
-    resp = chain.invoke({"context": combined_context, "question": last_query})
-    if hasattr(resp, "content"):
-        out = resp.content
-    elif isinstance(resp, dict) and "text" in resp:
-        out = resp["text"]
-    else:
-        out = str(resp)
-    return out
+    async with admission.slot("llm"):
+        resp = await llm.ainvoke(MULTI_DOC_PROMPT.format(context=combined_context, question=last_query))
+    return llm_clients.response_text(resp)
+
+
+async def stream_chat_with_documents(doc_ids, query, user_id=None, owner="shared", selected=None):
+    """Like chat_with_documents, but as an async generator of (kind, data) pairs.
+
+    Yields ("context", sources) once retrieval is done, then ("token", text)
+    as the model produces the answer. Closing the generator early (client
+    gone) closes the model stream and frees the LLM slot.
+    """
+    memory_context = _remember(user_id, query)
+    combined_context, sources = await retrieve_context(doc_ids, memory_context, owner, selected)
+    yield "context", sources
+    if not combined_context:
+        yield "token", NO_CONTEXT_ANSWER
+        return
+    llm = llm_clients.get_llm("chat")
+    async with admission.slot("llm"):
+        stream = llm.astream(MULTI_DOC_PROMPT.format(context=combined_context, question=query))
+        try:
+            async for chunk in stream:
+                text = llm_clients.response_text(chunk)
+                if text:
+                    yield "token", text
+        finally:
+            await stream.aclose()
 
 async def chat_with_document(doc_id: str, query: str):
-    cache_path = Path("../cache") / f"extract_{doc_id}.txt"
-    if not cache_path.exists():
-        raise FileNotFoundError("Document not found in cache.")
-    text = cache_path.read_text(encoding="utf-8")
+    text = await run_io(read_extracted_text, doc_id)
     # Build vector store
-    emb = EMBED_MODEL  # Use global model
-    vs_path = Path("../data") / f"vs_hf-legal-bert_{doc_id}"
-    if vs_path.exists():
-        store = FAISS.load_local(vs_path.as_posix(), emb, allow_dangerous_deserialization=True)
-    else:
-        from langchain.text_splitter import RecursiveCharacterTextSplitter
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        docs = splitter.create_documents([text])
-        docs = [d for d in docs if len(d.page_content.strip()) >= 40]
-        store = FAISS.from_documents(docs, emb)
-        store.save_local(vs_path.as_posix())
-    # Search relevant chunks
-    results = store.similarity_search_with_score(query, k=5)
+    store = await _open_store(doc_id, text)
+    # Search relevant chunks (a document with no indexable text has no store)
+    results = await _search(store, query, k=5) if store is not None else []
     context = "\n\n".join([doc.page_content.strip() for doc, score in results if score >= 0.2])
     # RAG prompt
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(Path(__file__).parent.parent / "gemini-api-key.json")
-    llm = ChatVertexAI(
-        model="gemini-2.5-flash-lite",
-        temperature=0.1,
-        max_output_tokens=1024,
-        top_p=0.95,
-        top_k=40,
-        project="legal-470807",
-    )
-    prompt = PromptTemplate(
-        input_variables=["context", "question"],
-        template=(
-            "You are a legal assistant AI specialized in simplifying complex legal documents. "
-            "Your role is to help users understand rental agreements, loan contracts, terms of service, "
-            "and other legal documents by providing clear summaries, explaining complex clauses, "
-            "and answering questions in simple, practical language.\n\n"
-            "CONTEXT:\n{context}\n\nQUESTION: {question}\n\nAnswer:"
-        ),
-    )
-    chain = LLMChain(llm=llm, prompt=prompt)
-    resp = chain.invoke({"context": context, "question": query})
-    # Gemini returns an AIMessage object, get the text
-    if hasattr(resp, "content"):
-        out = resp.content
-    elif isinstance(resp, dict) and "text" in resp:
-        out = resp["text"]
-    else:
-        out = str(resp)
-    return out
+    llm = llm_clients.get_llm("chat")
+    async with admission.slot("llm"):
+        resp = await llm.ainvoke(SINGLE_DOC_PROMPT.format(context=context, question=query))
+    return llm_clients.response_text(resp)
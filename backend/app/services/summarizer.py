@@ -1,10 +1,117 @@
 # backend/app/services/summarizer.py
 from app.models import AnalysisReport
-import re, json
-from langchain_google_vertexai import ChatVertexAI
+import os, re, json, asyncio, hashlib
+from contextlib import nullcontext
 from langchain.prompts import PromptTemplate
 from app.services.extractor import Extractor
-from pathlib import Path
+from app.services.document_processor import read_extracted_text
+from app.services.pools import run_io, run_cpu
+from app.services.clause_detector import document_clauses, PATTERNS_VERSION
+from app.services.context_selector import select_context, token_counter, SUMMARY_TOKEN_BUDGET
+from app.services.vector_stores import load_store
+from app.services.index_registry import index_registry
+from app.services import admission, llm_clients
+from app.services.json_stream import JsonObjectStream, parse_json_object
+
+# Documents longer than one window are summarized map-reduce style instead of in one call
+SUMMARY_WINDOW_CHARS = int(os.getenv("SUMMARY_WINDOW_CHARS", 16000))
+# Concurrent map/reduce calls per document (the global LLM admission limit still applies)
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", 8))
+# Partial analyses merged per reduce call
+SUMMARY_REDUCE_FAN_IN = int(os.getenv("SUMMARY_REDUCE_FAN_IN", 4))
+# How documents longer than one window are handled: "select" sends the highest-value
+# chunks that fit SUMMARY_TOKEN_BUDGET in one call, "map_reduce" analyses every section
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "select")
+
+SUMMARY_MODEL = llm_clients.model_name("summary")
+
+REPORT_SECTIONS = ["summary", "key_terms", "obligations", "costs_and_payments", "risks", "red_flags", "questions_to_ask", "negotiation_suggestions", "decision_assist"]
+REPORT_FIELDS = ", ".join(REPORT_SECTIONS)
+
+ANALYSIS_PROMPT = PromptTemplate(
+    input_variables=["document_text"],
+    template=(
+        "You are a legal clarity assistant. Your job is to explain legal documents in plain, neutral language, "
+        "flag potentially risky clauses, and suggest practical, non-legal-advice steps the user can take. "
+        "Avoid definitive legal conclusions; use careful wording ('may', 'could', 'appears to'). "
+        "Tailor explanations for a non-lawyer reader.\n\n"
+        "Document:\n{document_text}\n\n"
+        "Return a structured JSON object with these fields ONLY: " + REPORT_FIELDS + "."
+    ),
+)
+
+MAP_PROMPT = PromptTemplate(
+    input_variables=["section_text", "section_no", "section_count"],
+    template=(
+        "You are a legal clarity assistant. Below is section {section_no} of {section_count} of a longer legal document. "
+        "Analyse only this section in plain, neutral language, flag potentially risky clauses and note page numbers "
+        "(from the '--- Page N ---' markers) in where_found. Use careful wording ('may', 'could', 'appears to'). "
+        "Leave a field empty if the section says nothing about it.\n\n"
+        "Section:\n{section_text}\n\n"
+        "Return a structured JSON object with these fields ONLY: " + REPORT_FIELDS + "."
+    ),
+)
+
+REDUCE_PROMPT = PromptTemplate(
+    input_variables=["partial_reports"],
+    template=(
+        "You are a legal clarity assistant. The JSON objects below are analyses of consecutive sections of one legal document, "
+        "in document order. Merge them into a single analysis of the whole document: combine and de-duplicate items, "
+        "keep every distinct risk, obligation, cost and red flag with its where_found, and write the summary and "
+        "decision_assist for the document as a whole. Use careful wording ('may', 'could', 'appears to').\n\n"
+        "Partial analyses:\n{partial_reports}\n\n"
+        "Return a structured JSON object with these fields ONLY: " + REPORT_FIELDS + "."
+    ),
+)
+
+# What each report section should contain, for the one-section prompts behind ?fields=
+SECTION_INSTRUCTIONS = {
+    "summary": "a list of 3 to 6 short plain-language strings summarizing the document",
+    "key_terms": "a list of strings naming the important defined terms and concepts",
+    "obligations": 'an object {"you": [...], "other_party": [...]} listing each side\'s duties as strings',
+    "costs_and_payments": "a list of strings for every fee, payment, deposit or penalty, with amounts and timing",
+    "risks": 'a list of objects {"title", "why_it_matters", "where_found", "mitigations": [strings]}',
+    "red_flags": "a list of strings for clauses that look unusual or one-sided",
+    "questions_to_ask": "a list of questions the reader should ask before signing",
+    "negotiation_suggestions": "a list of practical changes the reader could ask for",
+    "decision_assist": 'an object {"pros": [strings], "cons": [strings], "overall_take": string}',
+}
+
+SECTION_PROMPT = PromptTemplate(
+    input_variables=["section", "instructions", "scope", "document_text"],
+    template=(
+        "You are a legal clarity assistant. Explain legal documents in plain, neutral language for a non-lawyer "
+        "and use careful wording ('may', 'could', 'appears to'). Page numbers come from the '--- Page N ---' markers.\n\n"
+        "Text ({scope}):\n{document_text}\n\n"
+        "Return a JSON object with the single field \"{section}\": {instructions}. "
+        "Use an empty value if the text says nothing about it."
+    ),
+)
+
+SECTION_REDUCE_PROMPT = PromptTemplate(
+    input_variables=["section", "instructions", "partials"],
+    template=(
+        "You are a legal clarity assistant. Each JSON object below holds the \"{section}\" of consecutive parts of one "
+        "legal document, in document order. Merge them into the \"{section}\" of the whole document, combining and "
+        "de-duplicating items. Use careful wording ('may', 'could', 'appears to').\n\n"
+        "Parts:\n{partials}\n\n"
+        "Return a JSON object with the single field \"{section}\": {instructions}."
+    ),
+)
+
+# Changes whenever a prompt, the way documents are split or the clause patterns change
+# (reports carry clause hits, and select mode ranks chunks by them); part of the analysis cache key
+PROMPT_VERSION = hashlib.sha256("\x00".join([
+    ANALYSIS_PROMPT.template, MAP_PROMPT.template, REDUCE_PROMPT.template,
+    str(SUMMARY_WINDOW_CHARS), str(SUMMARY_REDUCE_FAN_IN), SUMMARY_MODE, str(SUMMARY_TOKEN_BUDGET),
+    PATTERNS_VERSION,
+]).encode()).hexdigest()[:12]
+# The same for the per-section prompts
+SECTION_PROMPT_VERSION = hashlib.sha256("\x00".join([
+    SECTION_PROMPT.template, SECTION_REDUCE_PROMPT.template, json.dumps(SECTION_INSTRUCTIONS, sort_keys=True),
+    str(SUMMARY_WINDOW_CHARS), str(SUMMARY_REDUCE_FAN_IN), SUMMARY_MODE, str(SUMMARY_TOKEN_BUDGET),
+    PATTERNS_VERSION,
+]).encode()).hexdigest()[:12]
 
 def coerce_report_fields(result):
     # Coerce key_terms to list of strings
@@ -79,53 +186,86 @@ def coerce_report_fields(result):
         }
     return result
 
-async def summarize_document(doc_id: str):
-    # For MVP, load extracted text from cache
-    cache_path = Path("../cache") / f"extract_{doc_id}.txt"
-    if not cache_path.exists():
-        raise FileNotFoundError("Document not found in cache.")
-    text = cache_path.read_text(encoding="utf-8")
-    chunks = chunk_text(text)
-    # Use Gemini 2.5 Flash via Langchain
-    import os
-    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(Path(__file__).parent.parent / "gemini-api-key.json")
-    llm = ChatVertexAI(
-        model="gemini-2.5-flash-lite",
-        temperature=0.1,
-        max_output_tokens=2048,
-        top_p=0.95,
-        top_k=40,
-        project="legal-470807",
-    )
-    prompt = PromptTemplate(
-        input_variables=["document_text"],
-        template=(
-            "You are a legal clarity assistant. Your job is to explain legal documents in plain, neutral language, "
-            "flag potentially risky clauses, and suggest practical, non-legal-advice steps the user can take. "
-            "Avoid definitive legal conclusions; use careful wording ('may', 'could', 'appears to'). "
-            "Tailor explanations for a non-lawyer reader.\n\n"
-            "Document:\n{document_text}\n\n"
-            "Return a structured JSON object with these fields ONLY: summary, key_terms, obligations, costs_and_payments, risks, red_flags, questions_to_ask, negotiation_suggestions, decision_assist."
-        ),
-    )
-    big_text = "\n\n".join(chunks)[:20000]
-    resp = llm.invoke(prompt.format(document_text=big_text))
-    # Gemini returns an AIMessage object, get the text
-    if hasattr(resp, "content"):
-        resp_text = resp.content
-    else:
-        resp_text = str(resp)
-    import json
+def parse_model_json(resp) -> dict:
+    return parse_json_object(llm_clients.response_text(resp))
+
+async def _ask_json(llm, prompt_text: str, limit: asyncio.Semaphore = None) -> dict:
+    async with limit or nullcontext():
+        async with admission.slot("llm"):
+            resp = await llm.ainvoke(prompt_text)
+    return parse_model_json(resp)
+
+async def _stream_json(llm, prompt_text: str):
+    """Yields the top-level (key, value) members of the model's JSON answer as each one completes."""
+    parser = JsonObjectStream()
+    async with admission.slot("llm"):
+        stream = llm.astream(prompt_text)
+        try:
+            async for chunk in stream:
+                for member in parser.feed(llm_clients.response_text(chunk)):
+                    yield member
+        finally:
+            await stream.aclose()
+    parser.finish()
+
+async def map_reduce_partials(llm, sections, map_prompt=None, reduce_prompt=None):
+    """Analyses each section concurrently, then merges the partial results hierarchically.
+
+    Map calls run SUMMARY_MAP_CONCURRENCY at a time; the partials are then
+    reduced in groups of SUMMARY_REDUCE_FAN_IN, level by level, until at most
+    one group is left for the final reduce. map_prompt(text, no, count) and
+    reduce_prompt(partials) build the prompts; they default to the full report.
+    Returns (partial result dicts, number of reduce levels so far).
+    """
+    if map_prompt is None:
+        map_prompt = lambda text, no, count: MAP_PROMPT.format(section_text=text, section_no=no, section_count=count)  # noqa: E731
+    if reduce_prompt is None:
+        reduce_prompt = lambda group: REDUCE_PROMPT.format(partial_reports="\n\n".join(json.dumps(p) for p in group))  # noqa: E731
+    limit = asyncio.Semaphore(SUMMARY_MAP_CONCURRENCY)
+    partials = await asyncio.gather(*[
+        _ask_json(llm, map_prompt(section, i + 1, len(sections)), limit)
+        for i, section in enumerate(sections)
+    ])
+    fan_in = max(2, SUMMARY_REDUCE_FAN_IN)
+    levels = 0
+    while len(partials) > fan_in:
+        groups = [partials[i:i + fan_in] for i in range(0, len(partials), fan_in)]
+        partials = await asyncio.gather(*[
+            _ask_json(llm, reduce_prompt(group), limit)
+            # A lone trailing partial moves up a level as is
+            if len(group) > 1 else asyncio.sleep(0, group[0])
+            for group in groups
+        ])
+        levels += 1
+    return partials, levels
+
+async def select_sections(doc_id: str, text: str):
+    """Clause-guided selection of a long document's text, scored against its FAISS vectors.
+
+    The store is normally being built alongside summarization; waiting for it
+    keeps the selection (and so the cached report) the same every time.
+    """
     try:
-        result = json.loads(resp_text)
-    except Exception:
-        start = resp_text.find("{")
-        end = resp_text.rfind("}")
-        if start >= 0 and end > start:
-            result = json.loads(resp_text[start:end+1])
-        else:
-            raise RuntimeError("Model did not return JSON.")
-    result = coerce_report_fields(result)
+        await index_registry.ensure(doc_id, text)
+        store = await run_io(load_store, doc_id)
+    except Exception as e:
+        # Clause hits alone still rank the chunks
+        print(f"No vectors for context selection of {doc_id}: {e}")
+        store = None
+    return await run_io(select_context, text, SUMMARY_MODEL, SUMMARY_TOKEN_BUDGET, store)
+
+async def too_long_for_one_prompt(text: str, sections) -> bool:
+    """Over SUMMARY_TOKEN_BUDGET tokens in "select" mode, more than one window otherwise."""
+    if SUMMARY_MODE == "select":
+        _, count = token_counter(SUMMARY_MODEL)
+        return await run_io(count, text) > SUMMARY_TOKEN_BUDGET
+    return len(sections) > 1
+
+def coerce_section(name: str, value):
+    """Normalizes one report section the way coerce_report_fields does. Returns None if unusable."""
+    if name not in REPORT_SECTIONS:
+        return None
+    result = coerce_report_fields({name: value})
     # --- Patch: Ensure key_terms is always a list of strings ---
     if "key_terms" in result:
         if isinstance(result["key_terms"], dict):
@@ -137,8 +277,81 @@ async def summarize_document(doc_id: str):
             # Flatten any dicts inside the list
             result["key_terms"] = [kt["term"] if isinstance(kt, dict) and "term" in kt else str(kt) for kt in result["key_terms"]]
     # --- End Patch ---
-    report = AnalysisReport(**result)
-    return report.dict()
+    try:
+        return AnalysisReport(**{name: result[name]}).dict()[name]
+    except ValueError as e:
+        print(f"Dropping malformed '{name}' section: {e}")
+        return None
+
+async def analyze_sections(doc_id: str):
+    """Async generator over a document's analysis, section by section.
+
+    Yields (section name, value) as soon as the model has finished writing
+    that section, then ("report", the full AnalysisReport dict) last.
+    Long documents are cut down to their highest-value chunks (SUMMARY_MODE
+    "select") or map-reduced first, with only the final reduce streamed.
+    """
+    text = await run_io(read_extracted_text, doc_id)
+    llm = llm_clients.get_llm("summary")
+    sections = chunk_text(text, max_tokens=SUMMARY_WINDOW_CHARS)
+    if not await too_long_for_one_prompt(text, sections):
+        prompt_text = ANALYSIS_PROMPT.format(document_text=text)
+        meta = {"summary_mode": "single", "sections": 1}
+    elif SUMMARY_MODE == "select":
+        selected, info = await select_sections(doc_id, text)
+        prompt_text = ANALYSIS_PROMPT.format(document_text=selected)
+        meta = {"summary_mode": "select", "sections": 1, "selection": info}
+    else:
+        partials, levels = await map_reduce_partials(llm, sections)
+        prompt_text = REDUCE_PROMPT.format(partial_reports="\n\n".join(json.dumps(p) for p in partials))
+        meta = {"summary_mode": "map_reduce", "sections": len(sections), "reduce_levels": levels + 1}
+    result = {}
+    async for name, value in _stream_json(llm, prompt_text):
+        section = coerce_section(name, value)
+        if section is not None:
+            result[name] = section
+            yield name, section
+    result = coerce_report_fields(result)
+    clauses = await run_cpu(document_clauses, doc_id)
+    result["clause_hits"] = clauses["clause_hits"]
+    result["clauses"] = clauses["hits"]
+    result["meta"] = {**meta, "naive_risk_score": clauses["risk_score"]}
+    yield "report", AnalysisReport(**result).dict()
+
+async def summarize_section(doc_id: str, name: str):
+    """Computes one report section with its own smaller prompt (selected or map-reduced for long documents)."""
+    text = await run_io(read_extracted_text, doc_id)
+    llm = llm_clients.get_llm("summary")
+    instructions = SECTION_INSTRUCTIONS[name]
+    reduce_prompt = lambda group: SECTION_REDUCE_PROMPT.format(  # noqa: E731
+        section=name, instructions=instructions, partials="\n\n".join(json.dumps(p) for p in group))
+    sections = chunk_text(text, max_tokens=SUMMARY_WINDOW_CHARS)
+    if not await too_long_for_one_prompt(text, sections):
+        result = await _ask_json(llm, SECTION_PROMPT.format(
+            section=name, instructions=instructions, scope="the whole document", document_text=text))
+    elif SUMMARY_MODE == "select":
+        selected, _ = await select_sections(doc_id, text)
+        result = await _ask_json(llm, SECTION_PROMPT.format(
+            section=name, instructions=instructions, scope="excerpts of a longer document", document_text=selected))
+    else:
+        partials, _ = await map_reduce_partials(
+            llm, sections,
+            map_prompt=lambda part, no, count: SECTION_PROMPT.format(
+                section=name, instructions=instructions, scope=f"part {no} of {count} of a longer document", document_text=part),
+            reduce_prompt=reduce_prompt,
+        )
+        result = partials[0] if len(partials) == 1 else await _ask_json(llm, reduce_prompt(partials))
+    value = coerce_section(name, result[name]) if name in result else None
+    if value is None:
+        # Missing or malformed: fall back to the section's empty default
+        value = AnalysisReport().dict()[name]
+    return value
+
+async def summarize_document(doc_id: str):
+    report = None
+    async for name, value in analyze_sections(doc_id):
+        report = value  # the last item is the full report
+    return report
 
 def chunk_text(text: str, max_tokens: int = 2000):
     parts = re.split(r'(?<=[\.!?])\s+', text)
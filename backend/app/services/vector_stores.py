@@ -0,0 +1,291 @@
+# backend/app/services/vector_stores.py
+import os
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from langchain_community.vectorstores import FAISS
+from langchain_huggingface import HuggingFaceEmbeddings
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.embeddings import Embeddings
+from app.services import metrics
+from app.services.embedding_service import EmbeddingService, QUERY, DOCUMENT
+
+DATA_DIR = Path(os.getenv("DATA_DIR", "../data"))
+# hf-legal-bert, or fake for offline load tests (hash-seeded random vectors, no model download)
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "hf-legal-bert")
+FAKE_EMBED_DIM = 768
+# Memory budget for FAISS stores kept loaded between requests
+VECTOR_STORE_CACHE_MB = int(os.getenv("VECTOR_STORE_CACHE_MB", 512))
+# Query embeddings kept for repeated questions
+QUERY_EMBED_CACHE_SIZE = int(os.getenv("QUERY_EMBED_CACHE_SIZE", 1024))
+
+
+class BatchedEmbeddings(Embeddings):
+    """LangChain Embeddings that go through an EmbeddingService, for FAISS and the query cache."""
+
+    def __init__(self, service: EmbeddingService):
+        self.service = service
+
+    def embed_documents(self, texts):
+        return self.service.embed(texts, priority=DOCUMENT)
+
+    def embed_query(self, text):
+        return self.service.embed([text], priority=QUERY)[0]
+
+    async def aembed_documents(self, texts):
+        return await self.service.aembed(texts, priority=DOCUMENT)
+
+    async def aembed_query(self, text):
+        return (await self.service.aembed([text], priority=QUERY))[0]
+
+
+def _load_embedding_model():
+    if EMBED_BACKEND == "fake":
+        from langchain_community.embeddings import DeterministicFakeEmbedding
+        return DeterministicFakeEmbedding(size=FAKE_EMBED_DIM)
+    return HuggingFaceEmbeddings(
+        model_name="nlpaueb/legal-bert-base-uncased",
+        model_kwargs={"device": "cpu"},
+        encode_kwargs={"normalize_embeddings": True, "batch_size": 64},
+    )
+
+
+# Load the embedding model once globally; every caller shares its batching worker
+embedding_service = EmbeddingService(_load_embedding_model())
+EMBED_MODEL = BatchedEmbeddings(embedding_service)
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU of query vectors keyed by (embedding backend, normalized query)."""
+
+    def __init__(self, max_entries: int = QUERY_EMBED_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._vectors = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            vector = self._vectors.get(key)
+            if vector is not None:
+                self._vectors.move_to_end(key)
+        metrics.increment("query_embedding_cache.hit" if vector is not None else "query_embedding_cache.miss")
+        return vector
+
+    def put(self, key, vector):
+        with self._lock:
+            self._vectors[key] = vector
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+
+
+query_cache = QueryEmbeddingCache()
+
+
+def query_key(text: str):
+    # legal-bert is uncased and splits on whitespace, so this normalization does not change its vector
+    return EMBED_BACKEND, " ".join(text.lower().split())
+
+
+def cached_query_embedding(text: str):
+    """The vector of an equivalent query embedded before, or None."""
+    return query_cache.get(query_key(text))
+
+
+def encode_query(text: str):
+    """Runs the encoder on a query and caches the vector."""
+    key = query_key(text)
+    vector = EMBED_MODEL.embed_query(key[1])
+    query_cache.put(key, vector)
+    return vector
+
+
+async def aencode_query(text: str):
+    """encode_query for the event loop: waits on the embedding service without holding a thread."""
+    key = query_key(text)
+    vector = await EMBED_MODEL.aembed_query(key[1])
+    query_cache.put(key, vector)
+    return vector
+
+
+def embed_query(text: str):
+    """Embeds a query once; later calls with the same normalized text skip the encoder."""
+    vector = cached_query_embedding(text)
+    return vector if vector is not None else encode_query(text)
+
+
+def store_path(doc_id: str) -> Path:
+    return DATA_DIR / f"vs_{EMBED_BACKEND}_{doc_id}"
+
+
+def has_store(doc_id: str) -> bool:
+    return store_path(doc_id).exists()
+
+
+class StoreCache:
+    """Process-wide LRU of loaded FAISS stores, bounded by their size on disk.
+
+    Loading a store reads the index and unpickles the docstore; keeping it
+    in memory makes every later question on the document skip that. The
+    on-disk size (index plus pickled docstore) stands in for memory use.
+    Called from worker threads, hence the lock.
+    """
+
+    def __init__(self, max_bytes: int = VECTOR_STORE_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._stores = OrderedDict()  # key -> (store, size in bytes)
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._stores.get(key)
+            if entry is not None:
+                self._stores.move_to_end(key)
+        metrics.increment("vector_store_cache.hit" if entry else "vector_store_cache.miss")
+        return entry[0] if entry else None
+
+    def put(self, key: str, store: FAISS, size: int):
+        with self._lock:
+            old = self._stores.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._stores[key] = (store, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._stores.popitem(last=False)
+                self.bytes -= evicted
+                metrics.increment("vector_store_cache.evicted")
+
+    def invalidate(self, key: str):
+        with self._lock:
+            entry = self._stores.pop(key, None)
+            if entry is not None:
+                self.bytes -= entry[1]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._stores), "bytes": self.bytes, "max_bytes": self.max_bytes}
+
+
+store_cache = StoreCache()
+
+
+def _disk_size(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.iterdir() if f.is_file())
+
+
+def build_store(doc_id: str, text: str):
+    """Chunks and embeds a document's text and saves the FAISS store to disk.
+
+    Returns None, and writes nothing, when no chunk is long enough to index
+    (a blank scan, for instance).
+    """
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    docs = splitter.create_documents([text])
+    docs = [d for d in docs if len(d.page_content.strip()) >= 40]
+    if not docs:
+        return None
+    store = FAISS.from_documents(docs, EMBED_MODEL)
+    vs_path = store_path(doc_id)
+    store.save_local(vs_path.as_posix())
+    # Replaces any cached copy of an older build
+    store_cache.put(doc_id, store, _disk_size(vs_path))
+    return store
+
+
+def load_store(doc_id: str, text: str = None):
+    """Loads a document's FAISS store, building it from text if it does not exist yet.
+
+    Stores already in memory are returned from store_cache.
+    Returns None when there is no store and no indexable text to build one from.
+    """
+    vs_path = store_path(doc_id)
+    store = store_cache.get(doc_id)
+    if store is not None:
+        if vs_path.exists():
+            return store
+        # Deleted on disk behind our back
+        store_cache.invalidate(doc_id)
+    if vs_path.exists():
+        store = FAISS.load_local(vs_path.as_posix(), EMBED_MODEL, allow_dangerous_deserialization=True)
+        store_cache.put(doc_id, store, _disk_size(vs_path))
+        return store
+    if text is None:
+        return None
+    return build_store(doc_id, text)
+
+
+def delete_store(doc_id: str):
+    """Removes a document's FAISS store from memory and disk."""
+    store_cache.invalidate(doc_id)
+    shutil.rmtree(store_path(doc_id), ignore_errors=True)
+
+
+
+def _user_prefix(user_id: str) -> str:
+    # user ids come from request bodies; hashed so they cannot escape DATA_DIR
+    return f"vs_{EMBED_BACKEND}_user_{hashlib.sha256(user_id.encode()).hexdigest()[:12]}"
+
+
+def user_store_path(user_id: str, doc_ids) -> Path:
+    """A user's unified store; the name changes whenever their set of documents does."""
+    digest = hashlib.sha256("\n".join(sorted(doc_ids)).encode()).hexdigest()[:12]
+    return DATA_DIR / f"{_user_prefix(user_id)}_{digest}"
+
+
+def build_user_store(user_id: str, doc_ids) -> FAISS:
+    """Merges the chunks of a user's document stores into one store with doc_id metadata.
+
+    The vectors are copied out of the per-document indexes, so nothing is
+    embedded again. Older unified stores of the user are removed.
+    """
+    text_embeddings, metadatas = [], []
+    for doc_id in doc_ids:
+        store = load_store(doc_id)
+        if store is None:
+            continue
+        vectors = store.index.reconstruct_n(0, store.index.ntotal)
+        for i, vector in enumerate(vectors):
+            doc = store.docstore.search(store.index_to_docstore_id[i])
+            text_embeddings.append((doc.page_content, vector))
+            metadatas.append({**doc.metadata, "doc_id": doc_id})
+    if not text_embeddings:
+        return None
+    store = FAISS.from_embeddings(text_embeddings, EMBED_MODEL, metadatas=metadatas)
+    vs_path = user_store_path(user_id, doc_ids)
+    for old in DATA_DIR.glob(f"{_user_prefix(user_id)}_*"):
+        if old != vs_path:
+            store_cache.invalidate(old.name)
+            shutil.rmtree(old, ignore_errors=True)
+    store.save_local(vs_path.as_posix())
+    store_cache.put(vs_path.name, store, _disk_size(vs_path))
+    return store
+
+
+_user_store_locks = {}
+
+
+def load_user_store(user_id: str, doc_ids):
+    """Returns the unified store over those of doc_ids that are indexed, building it if needed.
+
+    Returns None when none of the documents has a store yet.
+    """
+    doc_ids = sorted(doc_id for doc_id in set(doc_ids) if has_store(doc_id))
+    if not doc_ids:
+        return None
+    vs_path = user_store_path(user_id, doc_ids)
+    # One build per user at a time; concurrent questions wait for it
+    with _user_store_locks.setdefault(user_id, threading.Lock()):
+        store = store_cache.get(vs_path.name)
+        if store is not None and vs_path.exists():
+            return store
+        if vs_path.exists():
+            store = FAISS.load_local(vs_path.as_posix(), EMBED_MODEL, allow_dangerous_deserialization=True)
+            store_cache.put(vs_path.name, store, _disk_size(vs_path))
+            return store
+        return build_user_store(user_id, doc_ids)
@@ -1,11 +1,17 @@
 # backend/app/utils.py
 import hashlib
-from pathlib import Path
+
+FINGERPRINT_BLOCK_SIZE = 1024 * 1024
 
 def file_fingerprint(path: str) -> str:
-    try:
-        st = Path(path).stat()
-        s = f"{path}|{st.st_mtime_ns}|{st.st_size}"
-        return hashlib.md5(s.encode()).hexdigest()
-    except Exception:
-        return hashlib.md5(Path(path).read_bytes()[:4096]).hexdigest()
+    """Content-addressed id for a file: the sha256 hex digest of its bytes.
+
+    Identical bytes map to the same id regardless of filename, location or
+    uploader, so extraction caches, vector stores and summaries keyed by it
+    are shared between duplicate uploads.
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(FINGERPRINT_BLOCK_SIZE), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: single-pass clause detector vs one re.finditer scan per pattern.
+
+The baseline is find_clause_hits from the Streamlit summarizer.py: twelve
+IGNORECASE scans over the whole text. Both are run on a synthetic contract
+with '--- Page N ---' markers (as produced by the extractor) and clause
+phrases sprinkled through it; hit counts per clause type are compared.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_clause_detector [--pages 1000] [--hit-rate 0.05] [--repeat 3]
+"""
+import argparse
+import random
+import re
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import clause_detector  # noqa: E402
+
+FILLER = [
+    "The parties agree that the Tenant shall keep the premises in good order and repair.",
+    "Rent is payable monthly in advance on the first day of each calendar month.",
+    "Notices under this Agreement must be given in writing to the addresses above.",
+    "Capitalised terms have the meanings given to them in the Definitions section.",
+]
+CLAUSES = [
+    "Any dispute shall be settled by Binding Arbitration.",
+    "A Late Fee of five percent applies to overdue amounts.",
+    "This Agreement is subject to the Governing Law of the State.",
+    "The term will Auto-Renew for successive one-year periods.",
+    "The Borrower provides a Personal Guaranty for all obligations.",
+    "Prepayment Penalties apply if the loan is repaid early.",
+    "The APR may change with the Index Rate.",
+    "Liquidated Damages of one month's rent are payable on breach.",
+]
+SENTENCES_PER_PAGE = 30
+
+
+def build_document(pages: int, hit_rate: float) -> str:
+    rnd = random.Random(42)
+    out = []
+    for page in range(1, pages + 1):
+        body = " ".join(
+            rnd.choice(CLAUSES) if rnd.random() < hit_rate else rnd.choice(FILLER)
+            for _ in range(SENTENCES_PER_PAGE)
+        )
+        out.append(f"\n--- Page {page} ---\n{body}")
+    return "\n".join(out).strip()
+
+
+def find_clause_hits(text: str):
+    """The per-pattern baseline from summarizer.py."""
+    hits = {}
+    for label, pat in clause_detector.CLAUSE_PATTERNS.items():
+        m = re.finditer(pat, text, flags=re.IGNORECASE)
+        examples = []
+        for match in m:
+            start = max(0, match.start() - 120)
+            end = min(len(text), match.end() + 120)
+            examples.append(text[start:end].strip().replace("\n", " "))
+        hits[label] = examples
+    return hits
+
+
+def timed(fn, text: str, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(text)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--hit-rate", type=float, default=0.05, help="fraction of sentences that are clauses")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    text = build_document(args.pages, args.hit_rate)
+    mb = len(text.encode("utf-8")) / 1e6
+    print(f"{args.pages} pages, {mb:.1f} MB\n")
+
+    baseline_s, baseline = timed(find_clause_hits, text, args.repeat)
+    detector_s, hits = timed(clause_detector.detect_clauses, text, args.repeat)
+
+    print(f"{'matcher':<14}{'median ms':>12}{'MB/s':>10}{'hits':>8}")
+    print(f"{'per-pattern':<14}{baseline_s * 1000:>12.0f}{mb / baseline_s:>10.1f}{sum(map(len, baseline.values())):>8}")
+    print(f"{'single-pass':<14}{detector_s * 1000:>12.0f}{mb / detector_s:>10.1f}{len(hits):>8}")
+    print(f"\nspeed-up: {baseline_s / detector_s:.1f}x")
+
+    counts = Counter(hit["label"] for hit in hits)
+    diffs = {label: (len(found), counts.get(label, 0)) for label, found in baseline.items() if len(found) != counts.get(label, 0)}
+    if diffs:
+        print("hit counts differ (per-pattern, single-pass):", diffs)
+    else:
+        print("hit counts match for every clause type")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Benchmark: query embedding throughput and latency, direct model calls vs the batching service.
+
+"direct" is what chat handlers used to do: every caller runs its own
+one-query forward pass on the shared model, concurrently with the others.
+"batched" sends the same queries through EmbeddingService, which merges
+whatever arrives within the batch window into one forward pass.
+
+Each of --concurrency callers embeds --requests distinct queries back to
+back. The model is the one EMBED_BACKEND selects (legal-bert by default);
+--simulate swaps in a stand-in whose forward pass costs a fixed overhead
+plus a per-text cost and, like one CPU, runs one pass at a time.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_embedding_service [--concurrency 1 8 64] [--requests 20]
+        [--window-ms 5] [--max-batch 64] [--threads 0] [--simulate]
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.embedding_service import EmbeddingService, QUERY  # noqa: E402
+
+QUESTIONS = [
+    "What happens if I pay the rent late?",
+    "Can the landlord keep my security deposit?",
+    "Is there a penalty for repaying the loan early?",
+    "Who is responsible for repairs?",
+    "How do I terminate this agreement?",
+    "Does the contract renew automatically?",
+]
+
+
+class SimulatedEncoder:
+    """Forward pass = overhead + per-text cost, one pass at a time."""
+
+    def __init__(self, overhead_ms: float = 20, per_text_ms: float = 2, dim: int = 768):
+        self.overhead = overhead_ms / 1000
+        self.per_text = per_text_ms / 1000
+        self.dim = dim
+        self._cpu = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._cpu:
+            time.sleep(self.overhead + self.per_text * len(texts))
+        return [[0.0] * self.dim for _ in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def load_model(simulate: bool):
+    if simulate:
+        return SimulatedEncoder()
+    from app.services.vector_stores import _load_embedding_model
+    return _load_embedding_model()
+
+
+def run(embed_one, concurrency: int, requests: int):
+    """Returns (wall seconds, per-query latencies)."""
+    latencies = []
+    lock = threading.Lock()
+
+    def caller(n):
+        mine = []
+        for i in range(requests):
+            query = f"{QUESTIONS[(n + i) % len(QUESTIONS)]} ({n}-{i})"
+            start = time.perf_counter()
+            embed_one(query)
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(caller, range(concurrency)))
+    return time.perf_counter() - start, latencies
+
+
+def report(name: str, concurrency: int, wall: float, latencies):
+    ms = sorted(t * 1000 for t in latencies)
+    p99 = ms[min(len(ms) - 1, int(0.99 * len(ms)))]
+    print(f"{name:<9}{concurrency:>6}{len(ms) / wall:>12.1f}{statistics.median(ms):>10.1f}{p99:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--requests", type=int, default=20, help="queries per caller")
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=0, help="intra-op threads for the service (0 = torch default)")
+    parser.add_argument("--simulate", action="store_true", help="use a stand-in encoder instead of the real model")
+    args = parser.parse_args()
+
+    model = load_model(args.simulate)
+    service = EmbeddingService(model, window_ms=args.window_ms, max_batch=args.max_batch, intra_op_threads=args.threads)
+    # Warm-up: first passes load weights and allocate buffers
+    model.embed_query(QUESTIONS[0])
+    service.embed([QUESTIONS[0]], priority=QUERY)
+
+    print(f"{'mode':<9}{'callers':>6}{'queries/s':>12}{'p50 ms':>10}{'p99 ms':>10}")
+    for concurrency in args.concurrency:
+        wall, latencies = run(model.embed_query, concurrency, args.requests)
+        report("direct", concurrency, wall, latencies)
+        wall, latencies = run(lambda q: service.embed([q], priority=QUERY)[0], concurrency, args.requests)
+        report("batched", concurrency, wall, latencies)
+
+
+if __name__ == "__main__":
+    main()
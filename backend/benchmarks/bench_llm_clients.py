@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-request LLM client overhead, fresh ChatVertexAI vs the shared registry.
+
+"fresh" reproduces what the request handlers used to do: point
+GOOGLE_APPLICATION_CREDENTIALS at the key file and construct a new
+ChatVertexAI for every request. "shared" is llm_clients.get_llm().
+
+Without --live only client acquisition is timed (no network). With --live
+each request also makes a short Gemini call, so the numbers include auth
+token fetches and connection set-up that a fresh client pays every time.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_llm_clients [--requests 50] [--live]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from langchain_google_vertexai import ChatVertexAI  # noqa: E402
+from app.services import llm_clients  # noqa: E402
+
+PROMPT = "Reply with the single word: ok"
+
+
+def fresh_client():
+    os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = str(llm_clients.DEFAULT_CREDENTIALS_PATH)
+    return ChatVertexAI(project=llm_clients.GEMINI_PROJECT, **llm_clients.PROFILES["chat"])
+
+
+def shared_client():
+    return llm_clients.get_llm("chat")
+
+
+async def run(acquire, requests: int, live: bool):
+    timings = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        llm = acquire()
+        if live:
+            await llm.ainvoke(PROMPT)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(name: str, timings):
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[min(len(ms) - 1, int(0.95 * len(ms)))]
+    print(f"{name:<8}{statistics.mean(ms):>12.2f}{statistics.median(ms):>12.2f}{p95:>12.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--live", action="store_true", help="make a real Gemini call per request")
+    args = parser.parse_args()
+
+    # Warm the registry so "shared" measures steady state, as after startup
+    llm_clients.init_clients()
+
+    print(f"{'client':<8}{'mean ms':>12}{'p50 ms':>12}{'p95 ms':>12}")
+    for name, acquire in (("fresh", fresh_client), ("shared", shared_client)):
+        report(name, asyncio.run(run(acquire, args.requests, args.live)))
+
+
+if __name__ == "__main__":
+    main()
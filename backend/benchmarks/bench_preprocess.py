@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Benchmark: NumPy OCR preprocessing vs the original ImageEnhance chain.
+
+Reports per-image preprocessing latency, end-to-end OCR latency and OCR
+accuracy (1 - character error rate) for each pipeline.
+
+Fixtures are pairs of <name>.<png|jpg|jpeg|tif|tiff> and <name>.txt holding the
+expected text. Without --fixtures a synthetic set is rendered: phone-sized
+(12 MP) skewed, unevenly lit pages plus a clean 300 DPI scan.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_preprocess [--fixtures DIR] [--repeat 3] [--no-ocr]
+"""
+import argparse
+import difflib
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services import preprocess as pre  # noqa: E402
+from app.services import ocr_engine  # noqa: E402
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".tif", ".tiff"}
+SAMPLE_LINES = [
+    "The Borrower shall repay the principal amount in equal monthly installments.",
+    "A late fee of five percent applies to any payment received after the due date.",
+    "Any dispute shall be resolved by binding arbitration in the county of the Lender.",
+    "This agreement renews automatically unless either party gives sixty days notice.",
+    "The Tenant is responsible for all repairs not caused by normal wear and tear.",
+    "Prepayment of the loan in full is subject to a penalty of two percent.",
+]
+
+
+def _font(size):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow without FreeType
+        return ImageFont.load_default()
+
+
+def render_fixtures(out_dir: Path):
+    rnd = random.Random(7)
+    specs = [
+        ("phone_skewed", (3024, 4032), 72, 2.5, True),
+        ("phone_dim", (3024, 4032), 72, -1.5, True),
+        ("scan_300dpi", (2480, 3508), 300, 0.0, False),
+    ]
+    for name, size, dpi, skew, uneven in specs:
+        lines = [rnd.choice(SAMPLE_LINES) for _ in range(24)]
+        im = Image.new("L", size, 235)
+        draw = ImageDraw.Draw(im)
+        font = _font(size[0] // 48)
+        y = size[1] // 12
+        for line in lines:
+            draw.text((size[0] // 14, y), line, fill=25, font=font)
+            y += size[0] // 28
+        if uneven:
+            shade = Image.linear_gradient("L").resize(size).point(lambda v: 255 - v // 3)
+            im = Image.composite(im, shade, Image.new("L", size, 160))
+            im = im.filter(ImageFilter.GaussianBlur(1.2))
+        if skew:
+            im = im.rotate(skew, expand=True, fillcolor=235, resample=Image.BICUBIC)
+        suffix = ".jpg" if uneven else ".png"
+        im.convert("RGB").save(out_dir / f"{name}{suffix}", dpi=(dpi, dpi), quality=90)
+        (out_dir / f"{name}.txt").write_text("\n".join(lines), encoding="utf-8")
+
+
+def load_fixtures(fixture_dir: Path):
+    pairs = []
+    for path in sorted(fixture_dir.iterdir()):
+        truth = path.with_suffix(".txt")
+        if path.suffix.lower() in IMAGE_SUFFIXES and truth.exists():
+            pairs.append((path, truth.read_text(encoding="utf-8")))
+    return pairs
+
+
+def accuracy(expected: str, actual: str) -> float:
+    norm = lambda s: " ".join(s.split())  # noqa: E731
+    return difflib.SequenceMatcher(None, norm(expected), norm(actual), autojunk=False).ratio()
+
+
+def run_pipeline(path: Path, pipeline, ocr: bool):
+    t0 = time.perf_counter()
+    with Image.open(path) as im:
+        prepared = pipeline(im)
+        prepared.load()
+        t1 = time.perf_counter()
+        text = ocr_engine.image_to_string(prepared, psm=6) if ocr else ""
+    t2 = time.perf_counter()
+    return t1 - t0, t2 - t0, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", type=Path, help="directory of image/.txt pairs")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-ocr", action="store_true", help="only time preprocessing")
+    args = parser.parse_args()
+
+    if pre.np is None:
+        sys.exit("NumPy is not installed; nothing to compare against.")
+    tmp = None
+    fixture_dir = args.fixtures
+    if fixture_dir is None:
+        tmp = tempfile.TemporaryDirectory()
+        fixture_dir = Path(tmp.name)
+        render_fixtures(fixture_dir)
+    fixtures = load_fixtures(fixture_dir)
+    if not fixtures:
+        sys.exit(f"No fixtures found in {fixture_dir}")
+
+    pipelines = {"enhance": pre.enhance, "numpy": pre.adaptive}
+    print(f"{'image':<22}{'pipeline':<10}{'prep ms':>10}{'total ms':>10}{'accuracy':>10}")
+    summary = {name: ([], [], []) for name in pipelines}
+    for path, truth in fixtures:
+        for name, pipeline in pipelines.items():
+            prep, total, text = [], [], ""
+            for _ in range(args.repeat):
+                p, t, text = run_pipeline(path, pipeline, not args.no_ocr)
+                prep.append(p)
+                total.append(t)
+            acc = accuracy(truth, text) if not args.no_ocr else float("nan")
+            summary[name][0].append(statistics.median(prep))
+            summary[name][1].append(statistics.median(total))
+            summary[name][2].append(acc)
+            print(f"{path.name:<22}{name:<10}{statistics.median(prep) * 1e3:>10.1f}"
+                  f"{statistics.median(total) * 1e3:>10.1f}{acc:>10.3f}")
+    print("-" * 62)
+    for name, (prep, total, acc) in summary.items():
+        print(f"{'mean':<22}{name:<10}{statistics.mean(prep) * 1e3:>10.1f}"
+              f"{statistics.mean(total) * 1e3:>10.1f}{statistics.mean(acc):>10.3f}")
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Load test: throughput and tail latency of /documents/upload and /chat/user.
+
+Drives a running backend with N concurrent clients and reports requests per
+second, latency percentiles and the status-code mix (429s show where the
+admission limits kick in). Upload latency is measured twice: until the 202
+is returned ("accept") and until the background job completes ("complete").
+
+For a run with no network or credentials, start the backend against the
+fake LLM provider, fake embeddings and the Firestore emulator:
+
+    gcloud emulators firestore start --host-port=localhost:8080
+    cd backend
+    LLM_PROVIDER=fake EMBED_BACKEND=fake FIRESTORE_EMULATOR_HOST=localhost:8080 \\
+        uvicorn app.main:app --port 8000
+
+Usage (from the backend directory):
+    python -m benchmarks.load_test [--scenario upload|chat|mixed] [--concurrency 8] [--requests 100]
+"""
+import argparse
+import statistics
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent.parent))
+
+from test_integration import build_test_pdf  # noqa: E402
+
+CHAT_QUERIES = [
+    "What happens if I pay late?",
+    "Who pays for repairs?",
+    "How can this agreement be terminated?",
+    "Is there a penalty for paying the loan off early?",
+    "How are disputes resolved?",
+]
+JOB_POLL_INTERVAL = 0.2
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.statuses = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, status):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            self.statuses[f"{name} {status}"] += 1
+
+    def report(self, elapsed: float):
+        print(f"{'operation':<18}{'count':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+        for name, values in sorted(self.latencies.items()):
+            ms = sorted(v * 1000 for v in values)
+            pct = lambda q: ms[min(len(ms) - 1, int(q * len(ms)))]  # noqa: E731
+            print(f"{name:<18}{len(ms):>7}{len(ms) / elapsed:>9.2f}{statistics.median(ms):>10.0f}"
+                  f"{pct(0.95):>10.0f}{pct(0.99):>10.0f}{ms[-1]:>10.0f}")
+        print("\nstatus codes:")
+        for key, count in sorted(self.statuses.items()):
+            print(f"  {key:<24}{count:>7}")
+
+
+def create_user(base_url: str) -> str:
+    response = requests.post(f"{base_url}/auth/register", json={
+        "name": "Load Test",
+        "email": f"load_{uuid.uuid4().hex[:12]}@example.com",
+        "password": "loadtestpassword",
+    }, timeout=30)
+    response.raise_for_status()
+    return response.json()["user"]["id"]
+
+
+def upload(base_url: str, user_id: str, pdf: bytes, recorder: Recorder, job_timeout: float):
+    # A unique trailer per request keeps content deduplication from short-circuiting the pipeline
+    body = pdf + f"% load-test {uuid.uuid4().hex}\n".encode()
+    start = time.perf_counter()
+    response = requests.post(
+        f"{base_url}/documents/upload",
+        files={"file": ("load_test.pdf", body, "application/pdf")},
+        data={"user_id": user_id},
+        timeout=job_timeout,
+    )
+    recorder.record("upload accept", time.perf_counter() - start, response.status_code)
+    if response.status_code != 202:
+        return None
+    job_id = response.json()["job_id"]
+    deadline = time.monotonic() + job_timeout
+    while time.monotonic() < deadline:
+        job = requests.get(f"{base_url}/jobs/{job_id}", timeout=30).json()
+        if job["status"] in ("completed", "failed"):
+            recorder.record("upload complete", time.perf_counter() - start, job["status"])
+            return job["doc_id"]
+        time.sleep(JOB_POLL_INTERVAL)
+    recorder.record("upload complete", time.perf_counter() - start, "timeout")
+    return None
+
+
+def chat(base_url: str, user_id: str, n: int, recorder: Recorder):
+    start = time.perf_counter()
+    response = requests.post(
+        f"{base_url}/chat/user",
+        json={"user_id": user_id, "query": CHAT_QUERIES[n % len(CHAT_QUERIES)]},
+        timeout=120,
+    )
+    recorder.record("chat", time.perf_counter() - start, response.status_code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--scenario", choices=["upload", "chat", "mixed"], default="mixed")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--pages", type=int, default=10, help="pages per uploaded PDF")
+    parser.add_argument("--job-timeout", type=float, default=600)
+    args = parser.parse_args()
+
+    user_id = create_user(args.base_url)
+    pdf = build_test_pdf(args.pages)
+    recorder = Recorder()
+    if args.scenario in ("chat", "mixed"):
+        # Chat needs at least one indexed document to retrieve from
+        upload(args.base_url, user_id, pdf, Recorder(), args.job_timeout)
+
+    def operation(n: int):
+        if args.scenario == "upload" or (args.scenario == "mixed" and n % 2 == 0):
+            upload(args.base_url, user_id, pdf, recorder, args.job_timeout)
+        else:
+            chat(args.base_url, user_id, n, recorder)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(operation, range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    print(f"{args.scenario}: {args.requests} requests at concurrency {args.concurrency} in {elapsed:.1f}s\n")
+    recorder.report(elapsed)
+
+
+if __name__ == "__main__":
+    main()
@@ -64,6 +64,25 @@ const createRequest = async (endpoint, options = {}) => {
 // Simulate API delay for development
 const simulateDelay = (ms = 1000) => new Promise(resolve => setTimeout(resolve, ms));
 
+// Uploads are processed in the background; poll the job until it settles
+const JOB_POLL_INTERVAL = 1500;
+
+const waitForJob = async (jobId) => {
+    while (true) {
+        const result = await createRequest(`/jobs/${jobId}`, { method: 'GET' });
+        if (!result.success) {
+            return result;
+        }
+        if (result.data.status === 'completed') {
+            return { success: true, data: result.data };
+        }
+        if (result.data.status === 'failed') {
+            return { success: false, error: result.data.error || 'Document processing failed' };
+        }
+        await simulateDelay(JOB_POLL_INTERVAL);
+    }
+};
+
 // Authentication Services
 export const authService = {
     // Login with email and password
@@ -205,27 +224,37 @@ export const fileService = {
                 }
             });
 
-            if (result.success) {
+            if (!result.success) {
+                return { success: false, error: result.error || 'Upload failed' };
+            }
+
+            const job = await waitForJob(result.data.job_id);
+            if (job.success) {
                 const fileData = {
-                    id: result.data.doc_id,
-                    name: result.data.meta.filename || file.name,
+                    id: job.data.doc_id,
+                    name: job.data.meta.filename || file.name,
                     size: file.size,
                     type: file.type,
                     uploadDate: new Date().toISOString(),
                     status: 'uploaded',
-                    analysisId: result.data.doc_id,
-                    summary: result.data.summary
+                    analysisId: job.data.doc_id,
+                    summary: job.data.summary
                 };
 
                 return { success: true, data: fileData };
             } else {
-                return { success: false, error: result.error || 'Upload failed' };
+                return { success: false, error: job.error || 'Upload failed' };
             }
         } catch (error) {
             return { success: false, error: 'Network error. Please check your connection.' };
         }
     },
 
+    // Get the status of a background upload job
+    getJob: async (jobId) => {
+        return createRequest(`/jobs/${jobId}`, { method: 'GET' });
+    },
+
     // Get file analysis status
     getAnalysisStatus: async (fileId) => {
         await simulateDelay(500);
@@ -335,10 +364,15 @@ export const fileService = {
 
 // Document Services
 export const documentService = {
-    // Get document summary
-    getSummary: async (documentId) => {
+    // Get document summary (served from the analysis cache unless refresh is set).
+    // fields (e.g. ['summary', 'risks']) limits the report to those sections.
+    getSummary: async (documentId, refresh = false, fields = null) => {
         try {
-            const result = await createRequest(`/analysis/${documentId}`, {
+            const params = new URLSearchParams();
+            if (refresh) params.set('refresh', 'true');
+            if (fields) params.set('fields', fields.join(','));
+            const query = params.toString() ? `?${params}` : '';
+            const result = await createRequest(`/analysis/${documentId}${query}`, {
                 method: 'GET'
             });
 
@@ -360,6 +394,25 @@ export const documentService = {
         }
     },
 
+    // Stream the analysis section by section; returns a function that stops the stream
+    streamSummary: (documentId, { onSection, onDone, onError, refresh = false } = {}) => {
+        const query = refresh ? '?refresh=true' : '';
+        const source = new EventSource(`${API_BASE_URL}/analysis/${documentId}/stream${query}`);
+        source.addEventListener('section', (e) => {
+            const { name, value } = JSON.parse(e.data);
+            onSection && onSection(name, value);
+        });
+        source.addEventListener('done', (e) => {
+            source.close();
+            onDone && onDone(JSON.parse(e.data));
+        });
+        source.addEventListener('error', (e) => {
+            source.close();
+            onError && onError(e.data ? JSON.parse(e.data).detail : 'Connection lost');
+        });
+        return () => source.close();
+    },
+
     // Chat with document
     chatWithDocument: async (documentId, userId, message) => {
         try {
@@ -390,6 +443,53 @@ export const documentService = {
         } catch (error) {
             return { success: false, error: 'Network error. Please check your connection.' };
         }
+    },
+
+    // Chat with streamed answer: onContext(sources) first, then onToken(text) per token
+    chatWithDocumentStream: async (userId, message, { onContext, onToken, signal, documentIds = null } = {}) => {
+        try {
+            const response = await fetch(`${API_BASE_URL}/chat/user/stream`, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ user_id: userId, query: message, document_ids: documentIds }),
+                signal
+            });
+            if (!response.ok) {
+                const data = await response.json().catch(() => ({}));
+                return { success: false, error: data.detail || 'Failed to get response' };
+            }
+
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let answer = '';
+            for (;;) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const raw of events) {
+                    const line = raw.split('\n').find((l) => l.startsWith('data: '));
+                    if (!line) continue;
+                    const event = JSON.parse(line.slice(6));
+                    if (event.event === 'context') {
+                        onContext && onContext(event.sources);
+                    } else if (event.event === 'token') {
+                        answer += event.text;
+                        onToken && onToken(event.text);
+                    } else if (event.event === 'error') {
+                        return { success: false, error: event.detail };
+                    }
+                }
+            }
+            return { success: true, data: { userId, userMessage: message, aiResponse: answer, timestamp: new Date().toISOString() } };
+        } catch (error) {
+            if (error.name === 'AbortError') {
+                return { success: false, error: 'Cancelled' };
+            }
+            return { success: false, error: 'Network error. Please check your connection.' };
+        }
     }
 };
 
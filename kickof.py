@@ -15,6 +15,11 @@ from PIL import Image, ImageEnhance
 import pytesseract
 from PyPDF2 import PdfReader
 
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
@@ -99,6 +104,23 @@ def file_fingerprint(path: str) -> str:
         logger.warning(f"fingerprint fallback: {e}")
         return hashlib.md5(Path(path).read_bytes()[:4096]).hexdigest()
 
+_ocr_local = threading.local()
+
+def ocr_image_to_string(im: Image.Image, lang: str = "eng") -> str:
+    """OCR with a loaded Tesseract handle kept per thread; pytesseract if tesserocr is missing."""
+    if tesserocr is not None:
+        apis = getattr(_ocr_local, "apis", None)
+        if apis is None:
+            apis = _ocr_local.apis = {}
+        try:
+            if lang not in apis:
+                apis[lang] = tesserocr.PyTessBaseAPI(lang=lang, psm=tesserocr.PSM.SINGLE_BLOCK, oem=tesserocr.OEM.DEFAULT)
+            apis[lang].SetImage(im)
+            return apis[lang].GetUTF8Text()
+        except RuntimeError as e:
+            logger.warning(f"tesserocr unavailable, using pytesseract: {e}")
+    return pytesseract.image_to_string(im, config="--oem 3 --psm 6", lang=lang)
+
 def clean_text(text: str) -> str:
     import re
     text = text.replace("\x00", " ")
@@ -164,7 +186,7 @@ class Extractor:
                     im = im.convert("L")
                 im = ImageEnhance.Contrast(im).enhance(1.6)
                 im = ImageEnhance.Sharpness(im).enhance(1.8)
-                text = pytesseract.image_to_string(im, config="--oem 3 --psm 6", lang=lang)
+                text = ocr_image_to_string(im, lang=lang)
                 text = clean_text(text)
         except Exception as e:
             return f"Error reading image: {e}"
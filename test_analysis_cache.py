@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the local disk tier of the analysis cache (backend/app/services/analysis_cache.py).
+Run with pytest from the repository root; pytest.ini puts backend/ on the import path.
+"""
+import os
+import threading
+
+import pytest
+
+pytest.importorskip("langchain")
+# Importing the cache pulls in the vector stores; keep them off the real embedding model
+os.environ.setdefault("EMBED_BACKEND", "fake")
+
+from app.services.analysis_cache import AnalysisCache  # noqa: E402
+
+THREADS = 8
+ROUNDS = 300
+
+
+def test_concurrent_eviction_is_a_miss_not_an_error(tmp_path):
+    # Far more live keys than entries, so every write evicts while other threads read and evict
+    cache = AnalysisCache(tmp_path, max_entries=4)
+    errors = []
+    start = threading.Barrier(THREADS)
+
+    def worker(n):
+        start.wait()
+        try:
+            for i in range(ROUNDS):
+                cache._write_disk(f"doc{n}_{i % 16}", {"summary": f"{n}-{i}"})
+                report = cache._read_disk(f"doc{(n + 1) % THREADS}_{i % 16}")
+                assert report is None or "summary" in report
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    cache._evict()
+    assert len(list(tmp_path.glob("*.json"))) <= 4
+
+
+def test_read_of_an_entry_evicted_after_reading_is_a_miss(tmp_path, monkeypatch):
+    cache = AnalysisCache(tmp_path, max_entries=4)
+    cache._write_disk("doc", {"summary": "s"})
+
+    def evicted(path, *args, **kwargs):
+        raise FileNotFoundError(path)
+
+    monkeypatch.setattr(os, "utime", evicted)
+    assert cache._read_disk("doc") is None
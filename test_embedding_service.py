@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the batching embedding worker (backend/app/services/embedding_service.py).
+Run with pytest from the repository root; pytest.ini puts backend/ on the import path.
+"""
+import asyncio
+import threading
+
+from app.services.embedding_service import EmbeddingService
+
+
+class GatedEncoder:
+    """Each forward pass waits until the test opens the gate."""
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.started = threading.Event()
+
+    def embed_documents(self, texts):
+        self.started.set()
+        self.gate.wait(5)
+        return [[float(len(text))] for text in texts]
+
+
+def test_cancelled_caller_does_not_stop_the_worker():
+    model = GatedEncoder()
+    service = EmbeddingService(model, window_ms=0)
+
+    async def scenario():
+        # Occupies the worker so the next request stays queued
+        busy = service.submit(["busy"])[0]
+        assert await asyncio.to_thread(model.started.wait, 5)
+        queued = asyncio.ensure_future(service.aembed(["dropped"]))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        model.gate.set()
+        assert busy.result(5) == [[4.0]]
+        return await asyncio.wait_for(service.aembed(["after"]), 5)
+
+    assert asyncio.run(scenario()) == [[5.0]]
+    assert service._worker.is_alive()
+
+
+def test_caller_cancelled_during_its_batch_does_not_stop_the_worker():
+    model = GatedEncoder()
+    service = EmbeddingService(model, window_ms=0)
+
+    async def scenario():
+        running = asyncio.ensure_future(service.aembed(["running"]))
+        assert await asyncio.to_thread(model.started.wait, 5)
+        running.cancel()
+        model.gate.set()
+        return await asyncio.wait_for(service.aembed(["after"]), 5)
+
+    assert asyncio.run(scenario()) == [[5.0]]
+    assert service._worker.is_alive()
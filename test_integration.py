@@ -7,12 +7,19 @@ import requests
 import json
 import time
 import sys
+import threading
 from pathlib import Path
 
 # Configuration
 BACKEND_URL = "http://localhost:8000"
 FRONTEND_URL = "http://localhost:5173"
 TEST_TIMEOUT = 10
+# /health must keep answering within this many seconds while a large upload is processed
+HEALTH_LATENCY_LIMIT = 0.5
+LARGE_UPLOAD_PAGES = 400
+# Default JOB_STAGE_WORKERS + JOB_QUEUE_SIZE uploads fill the extraction stage; a few more must get 429
+BACKPRESSURE_UPLOADS = 2 + 16 + 4
+BACKPRESSURE_PAGES = 200
 
 def test_backend_health():
     """Test if backend is running and healthy"""
@@ -137,6 +144,134 @@ def test_documents_endpoint(user_id):
         print(f"❌ Documents endpoint error: {e}")
         return False
 
+def build_test_pdf(num_pages):
+    """Builds a text PDF with num_pages pages, without any PDF library."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(num_pages)), num_pages),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for i in range(num_pages):
+        lines = " ".join(
+            f"({i + 1}.{n} The Borrower shall pay a late fee and default interest.) Tj T*" for n in range(40)
+        )
+        stream = f"BT /F1 10 Tf 12 TL 50 760 Td {lines} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for n, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{n} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{off:010d} 00000 n \n" for off in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+def test_health_during_upload(user_id):
+    """Regression test: /health stays responsive while a large upload is processed"""
+    print(f"🔍 Testing /health latency during a {LARGE_UPLOAD_PAGES}-page upload...")
+    # Unique content, so the upload is not served from the dedup cache
+    pdf = build_test_pdf(LARGE_UPLOAD_PAGES) + f"% {time.time()}\n".encode()
+    done = threading.Event()
+    outcome = {}
+
+    def upload():
+        try:
+            response = requests.post(
+                f"{BACKEND_URL}/documents/upload",
+                files={"file": ("health_check_large.pdf", pdf, "application/pdf")},
+                data={"user_id": user_id},
+                timeout=120,
+            )
+            outcome["upload"] = response.status_code
+            job_id = response.json().get("job_id") if response.ok else None
+            # Keep the load on until extraction and indexing are over
+            while job_id:
+                job = requests.get(f"{BACKEND_URL}/jobs/{job_id}", timeout=TEST_TIMEOUT).json()
+                if job.get("status") in ("completed", "failed") or job.get("stage") in ("indexed", "summarized"):
+                    break
+                time.sleep(0.5)
+        except requests.exceptions.RequestException as e:
+            outcome["error"] = str(e)
+        finally:
+            done.set()
+
+    worker = threading.Thread(target=upload, daemon=True)
+    worker.start()
+    latencies = []
+    try:
+        while not done.is_set():
+            start = time.perf_counter()
+            response = requests.get(f"{BACKEND_URL}/health", timeout=TEST_TIMEOUT)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                print(f"❌ /health failed during upload: {response.status_code}")
+                return False
+            time.sleep(0.05)
+    except requests.exceptions.RequestException as e:
+        print(f"❌ /health did not answer during upload: {e}")
+        return False
+    worker.join()
+
+    if "error" in outcome or outcome.get("upload") not in (200, 202):
+        print(f"❌ Large upload failed: {outcome}")
+        return False
+    worst = max(latencies) if latencies else 0.0
+    if worst > HEALTH_LATENCY_LIMIT:
+        print(f"❌ /health took up to {worst:.3f}s during the upload ({len(latencies)} probes)")
+        return False
+    print(f"✅ /health stayed responsive: max {worst * 1000:.0f} ms over {len(latencies)} probes")
+    return True
+
+def test_upload_backpressure(user_id):
+    """Regression test: with the default limits, a burst of uploads gets 429 with Retry-After"""
+    print(f"🔍 Testing upload backpressure with {BACKPRESSURE_UPLOADS} concurrent uploads...")
+    base = build_test_pdf(BACKPRESSURE_PAGES)
+    results = []
+    lock = threading.Lock()
+
+    def upload(n):
+        # Unique content each, so none is served from the dedup cache
+        pdf = base + f"% backpressure {n} {time.time()}\n".encode()
+        try:
+            response = requests.post(
+                f"{BACKEND_URL}/documents/upload",
+                files={"file": (f"backpressure_{n}.pdf", pdf, "application/pdf")},
+                data={"user_id": user_id},
+                timeout=120,
+            )
+            outcome = (response.status_code, response.headers.get("Retry-After"))
+        except requests.exceptions.RequestException as e:
+            outcome = ("error", str(e))
+        with lock:
+            results.append(outcome)
+
+    workers = [threading.Thread(target=upload, args=(n,), daemon=True) for n in range(BACKPRESSURE_UPLOADS)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    errors = [r for r in results if r[0] not in (202, 429)]
+    rejected = [r for r in results if r[0] == 429]
+    if errors:
+        print(f"❌ Unexpected upload responses: {errors}")
+        return False
+    if not rejected:
+        print(f"❌ No upload was turned away: {len(results)} accepted")
+        return False
+    if not all(retry_after and retry_after.isdigit() and int(retry_after) >= 1 for _, retry_after in rejected):
+        print(f"❌ 429 without a usable Retry-After: {rejected}")
+        return False
+    print(f"✅ {len(rejected)} of {len(results)} uploads got 429 with Retry-After {sorted({r for _, r in rejected})}")
+    return True
+
 def test_frontend_accessibility():
     """Test if frontend is accessible"""
     print("🔍 Testing frontend accessibility...")
@@ -159,7 +294,7 @@ def main():
     print("=" * 60)
     
     tests_passed = 0
-    total_tests = 6
+    total_tests = 8
     
     # Test 1: Backend Health
     if test_backend_health():
@@ -182,7 +317,15 @@ def main():
     if user_id and test_documents_endpoint(user_id):
         tests_passed += 1
     
-    # Test 6: Frontend Accessibility
+    # Test 6: Event loop stays responsive during a large upload
+    if user_id and test_health_during_upload(user_id):
+        tests_passed += 1
+    
+    # Test 7: A burst of uploads is turned away with 429 instead of queueing without bound
+    if user_id and test_upload_backpressure(user_id):
+        tests_passed += 1
+    
+    # Test 8: Frontend Accessibility
     if test_frontend_accessibility():
         tests_passed += 1
     